@@ -1,11 +1,16 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
-from typing import List, NamedTuple, Optional, Dict
+from dataclasses import dataclass, field, fields
+from typing import Any, Iterator, List, NamedTuple, Optional, Set, Tuple, cast
 
 import monkey.token as token
 
 
+# Nodes are dataclasses and the parser constructs them positionally, so the
+# order fields are declared in is part of each node's interface. New fields go
+# at the end with a default.
 class Node(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def token_literal(self) -> str:
         ...
@@ -15,9 +20,12 @@ class Node(ABC):
         ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Program(Node):
     statements: List[Node] = field(default_factory=list)
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         if len(self.statements) > 0:
@@ -26,10 +34,12 @@ class Program(Node):
             return ""
 
     def __str__(self) -> str:
-        return "".join([str(s) for s in self.statements])
+        if self._str_cache is None:
+            self._str_cache = "".join([str(s) for s in self.statements])
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class Identifier(Node):
     token: token.Token
     value: str
@@ -41,32 +51,44 @@ class Identifier(Node):
         return self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class LetStatement(Node):
     token: token.Token
     name: Identifier
     value: Node
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
-        return f"{self.token_literal()} {str(self.name)} = {str(self.value)}"
+        if self._str_cache is None:
+            self._str_cache = (
+                f"{self.token_literal()} {str(self.name)} = {str(self.value)}"
+            )
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class ReturnStatement(Node):
     token: token.Token
-    value: Identifier
+    value: Node
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
-        return f"{self.token_literal()} {str(self.value)};"
+        if self._str_cache is None:
+            self._str_cache = f"{self.token_literal()} {str(self.value)};"
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class ExpressionStatement(Node):
     token: token.Token
     expression: Node
@@ -78,7 +100,7 @@ class ExpressionStatement(Node):
         return str(self.expression)
 
 
-@dataclass
+@dataclass(slots=True)
 class IntegerLiteral(Node):
     token: token.Token
     value: int
@@ -90,34 +112,44 @@ class IntegerLiteral(Node):
         return self.token.literal
 
 
-@dataclass
+@dataclass(slots=True)
 class PrefixExpression(Node):
     token: token.Token
     operator: str
     right: Node
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
-        return f"({self.operator}{str(self.right)})"
+        if self._str_cache is None:
+            self._str_cache = f"({self.operator}{str(self.right)})"
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class InfixExpression(Node):
     token: token.Token
     left: Node
     operator: str
     right: Node
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
-        return f"({str(self.left)} {self.operator} {str(self.right)})"
+        if self._str_cache is None:
+            self._str_cache = f"({str(self.left)} {self.operator} {str(self.right)})"
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class Boolean(Node):
     token: token.Token
     value: bool
@@ -129,10 +161,13 @@ class Boolean(Node):
         return self.token.literal
 
 
-@dataclass
+@dataclass(slots=True)
 class BlockStatement(Node):
     token: token.Token
     statements: List[Node]
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def statement_node(self):
         pass
@@ -141,53 +176,78 @@ class BlockStatement(Node):
         return self.token.literal
 
     def __str__(self) -> str:
-        return "\n".join([str(s) for s in self.statements])
+        if self._str_cache is None:
+            self._str_cache = "\n".join([str(s) for s in self.statements])
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class IfExpression(Node):
     token: token.Token
     condition: Node
     consequence: BlockStatement
     alternative: Optional[BlockStatement]
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
-        if self.alternative is not None:
-            return f"if\n{str(self.condition)} {str(self.consequence)} else\n{str(self.alternative)}"
-        else:
-            return f"if\n{str(self.condition)} {str(self.consequence)}"
+        if self._str_cache is None:
+            if self.alternative is not None:
+                self._str_cache = f"if\n{str(self.condition)} {str(self.consequence)} else\n{str(self.alternative)}"
+            else:
+                self._str_cache = f"if\n{str(self.condition)} {str(self.consequence)}"
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class FunctionLiteral(Node):
     token: token.Token
     params: List[Identifier]
     body: BlockStatement
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # Names the function uses without binding them, see free_identifiers
+    _free: Optional[Tuple[str, ...]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
-        return f"{self.token_literal()}({', '.join([str(s) for s in self.params])}){str(self.body)}"
+        if self._str_cache is None:
+            self._str_cache = f"{self.token_literal()}({', '.join([str(s) for s in self.params])}){str(self.body)}"
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class CallExpression(Node):
     token: token.Token
     function: Node
     arguments: List[Node]
+    # Whether the arguments can be evaluated concurrently, worked out on first use
+    _pure: Optional[bool] = field(default=None, init=False, repr=False, compare=False)
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
-        return f"{str(self.function)}({', '.join([str(s) for s in self.arguments])})"
+        if self._str_cache is None:
+            self._str_cache = (
+                f"{str(self.function)}({', '.join([str(s) for s in self.arguments])})"
+            )
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class StringLiteral(Node):
     token: token.Token
     value: str
@@ -195,46 +255,146 @@ class StringLiteral(Node):
     def token_literal(self) -> str:
         return self.token.literal
 
-    def __hash__(self) -> int:
-        return hash(self.value)
-
     def __str__(self) -> str:
         return self.token.literal
 
 
-@dataclass
+@dataclass(slots=True)
 class ArrayLiteral(Node):
     token: token.Token
     elements: List[Node]
+    # Whether the elements can be evaluated concurrently, worked out on first use
+    _pure: Optional[bool] = field(default=None, init=False, repr=False, compare=False)
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
-        return f'[{", ".join([str(e) for e in self.elements])}]'
+        if self._str_cache is None:
+            self._str_cache = f'[{", ".join([str(e) for e in self.elements])}]'
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class IndexExpression(Node):
     token: token.Token
     left: Node
     index: Node
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
-    def __str__(self):
-        return f"({str(self.left)}[{str(self.index)}])"
+    def __str__(self) -> str:
+        if self._str_cache is None:
+            self._str_cache = f"({str(self.left)}[{str(self.index)}])"
+        return self._str_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class HashLiteral(Node):
     token: token.Token
-    pairs: Dict[Node, Node]
+    # Kept as (key, value) pairs, keys are hashed once they're evaluated
+    pairs: List[Tuple[Node, Node]]
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def token_literal(self) -> str:
         return self.token.literal
 
     def __str__(self) -> str:
         # [TODO] This is pretty messy
-        return str({str(k): str(v) for k, v in self.pairs.items()})
+        if self._str_cache is None:
+            self._str_cache = str({str(k): str(v) for k, v in self.pairs})
+        return self._str_cache
+
+
+# Produced by transform.peephole from an addition or subtraction of an integer
+# literal, `constant` is the signed amount added to the left operand
+@dataclass(slots=True)
+class AddK(Node):
+    token: token.Token
+    left: Node
+    operator: str
+    right: IntegerLiteral
+    constant: int
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def token_literal(self) -> str:
+        return self.token.literal
+
+    def __str__(self) -> str:
+        if self._str_cache is None:
+            self._str_cache = f"({str(self.left)} {self.operator} {str(self.right)})"
+        return self._str_cache
+
+
+# Names of the fields holding node's children, every field except its token
+# and private caches. Concrete nodes are all dataclasses, Node itself isn't.
+def child_fields(node: Node) -> Iterator[str]:
+    for f in fields(cast(Any, node)):
+        if f.name != "token" and not f.name.startswith("_"):
+            yield f.name
+
+
+# Every identifier anywhere in node, including names being bound
+def identifiers(node) -> Iterator[Identifier]:
+    if isinstance(node, Identifier):
+        yield node
+    elif isinstance(node, (list, tuple)):
+        for n in node:
+            yield from identifiers(n)
+    elif isinstance(node, Node):
+        for name in child_fields(node):
+            yield from identifiers(getattr(node, name))
+
+
+# Every call expression anywhere in node
+def calls(node) -> Iterator[CallExpression]:
+    if isinstance(node, CallExpression):
+        yield node
+    if isinstance(node, (list, tuple)):
+        for n in node:
+            yield from calls(n)
+    elif isinstance(node, Node):
+        for name in child_fields(node):
+            yield from calls(getattr(node, name))
+
+
+# Names a function literal uses that aren't its parameters or bound by a let
+# before they're used, those are looked up in the environment it was defined in
+def free_identifiers(fn: FunctionLiteral) -> Set[str]:
+    free: Set[str] = set()
+    _collect_free(fn, set(), free)
+    return free
+
+
+def _collect_free(node, bound: Set[str], free: Set[str]) -> None:
+    if isinstance(node, Identifier):
+        if node.value not in bound:
+            free.add(node.value)
+    elif isinstance(node, FunctionLiteral):
+        _collect_free(node.body, bound | {p.value for p in node.params}, free)
+    elif isinstance(node, LetStatement):
+        _collect_free(node.value, bound, free)
+        bound.add(node.name.value)
+    elif isinstance(node, IfExpression):
+        # A let in a branch only binds the name if that branch runs, so it
+        # doesn't count as bound after the if
+        _collect_free(node.condition, bound, free)
+        _collect_free(node.consequence, set(bound), free)
+        _collect_free(node.alternative, set(bound), free)
+    elif isinstance(node, (list, tuple)):
+        for n in node:
+            _collect_free(n, bound, free)
+    elif isinstance(node, Node):
+        for name in child_fields(node):
+            _collect_free(getattr(node, name), bound, free)
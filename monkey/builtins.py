@@ -9,9 +9,9 @@ def _builtin_len(args: List[monkey_obj.Object]) -> monkey_obj.Object:
         return monkey_obj.Error(f"wrong number of arguments. got={len(args)}, want=1")
     item = next(iter(args))
     if isinstance(item, monkey_obj.String):
-        return monkey_obj.Integer(value=len(item.value))
+        return monkey_obj.make_int(len(item.value))
     elif isinstance(item, monkey_obj.Array):
-        return monkey_obj.Integer(value=len(item.elements))
+        return monkey_obj.make_int(item.length())
     else:
         return monkey_obj.Error(
             f"argument to `len` not supported, got {item.object_type()}"
@@ -27,8 +27,8 @@ def _builtin_first(args: List[monkey_obj.Object]) -> monkey_obj.Object:
     if not isinstance(item, monkey_obj.Array):
         return monkey_obj.Error(f"argumetn to `first` must be ARRAY, got {type(item)}")
 
-    if len(item.elements) > 0:
-        return item.elements[0]
+    if item.length() > 0:
+        return item.elements[item.start]
 
     return monkey_obj.NULL
 
@@ -42,8 +42,8 @@ def _builtin_last(args: List[monkey_obj.Object]) -> monkey_obj.Object:
     if not isinstance(item, monkey_obj.Array):
         return monkey_obj.Error(f"argumetn to `last` must be ARRAY, got {type(item)}")
 
-    if len(item.elements) > 0:
-        return item.elements[-1]
+    if item.length() > 0:
+        return item.elements[item.end - 1]
 
     return monkey_obj.NULL
 
@@ -57,8 +57,8 @@ def _builtin_rest(args: List[monkey_obj.Object]) -> monkey_obj.Object:
     if not isinstance(item, monkey_obj.Array):
         return monkey_obj.Error(f"argumetn to `rest` must be ARRAY, got {type(item)}")
 
-    if len(item.elements) > 0:
-        return monkey_obj.Array(item.elements[1:])
+    if item.length() > 0:
+        return monkey_obj.Array(item.elements, item.start + 1, item.end)
 
     return monkey_obj.NULL
 
@@ -72,7 +72,13 @@ def _builtin_push(args: List[monkey_obj.Object]) -> monkey_obj.Object:
     if not isinstance(arr, monkey_obj.Array):
         return monkey_obj.Error(f"argumetn to `push` must be ARRAY, got {type(arr)}")
 
-    return monkey_obj.Array(arr.elements + [obj])
+    if arr.end == len(arr.elements):
+        # No other array has been extended from this one, so the shared list
+        # can grow in place
+        arr.elements.append(obj)
+        return monkey_obj.Array(arr.elements, arr.start, arr.end + 1)
+
+    return monkey_obj.Array(arr.values() + [obj])
 
 
 def _builtin_puts(args: List[monkey_obj.Object]) -> monkey_obj.Object:
@@ -89,3 +95,8 @@ builtins = {
     "push": Builtin(fn=_builtin_push),
     "puts": Builtin(fn=_builtin_puts),
 }
+
+# Builtins are resolved at compile time to an index into these tuples
+builtin_fns = tuple(builtins.values())
+builtin_names = tuple(builtins)
+builtin_index = {name: index for index, name in enumerate(builtins)}
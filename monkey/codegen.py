@@ -0,0 +1,232 @@
+import os
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import monkey.ast as ast
+import monkey.object as monkey_obj
+
+try:
+    import numba  # type: ignore[import-not-found]
+except ImportError:
+    numba = None
+
+# Hot functions over integers can be translated to Python source and, when
+# numba is installed, compiled to native code. This is opt in with MONKEY_JIT=1
+# since numba's compile time only pays off for functions called many times.
+JIT_ENABLED = os.environ.get("MONKEY_JIT") == "1"
+JIT_THRESHOLD = 50
+
+# Compiled code works on 64 bit integers, monkey integers are unbounded. Any
+# argument or result outside this range raises OverflowError and the call is
+# evaluated by the interpreter instead.
+INT_MIN = -(2**63)
+INT_MAX = 2**63 - 1
+
+INT = "int"
+BOOL = "bool"
+
+
+# Arithmetic in compiled code goes through these, which check for overflow
+# before the operation so they behave the same on numba's integers as Python's
+def _add(a: int, b: int) -> int:
+    if (b > 0 and a > INT_MAX - b) or (b < 0 and a < INT_MIN - b):
+        raise OverflowError
+    return a + b
+
+
+def _sub(a: int, b: int) -> int:
+    if (b < 0 and a > INT_MAX + b) or (b > 0 and a < INT_MIN + b):
+        raise OverflowError
+    return a - b
+
+
+def _mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    # Rejecting INT_MIN outright keeps the absolute values in range
+    if a == INT_MIN or b == INT_MIN or abs(a) > INT_MAX // abs(b):
+        raise OverflowError
+    return a * b
+
+
+def _div(a: int, b: int) -> int:
+    if a == INT_MIN and b == -1:
+        raise OverflowError
+    return a // b
+
+
+def _neg(a: int) -> int:
+    if a == INT_MIN:
+        raise OverflowError
+    return -a
+
+
+_RUNTIME = {"_add": _add, "_sub": _sub, "_mul": _mul, "_div": _div, "_neg": _neg}
+
+_arithmetic = {"+": "_add", "-": "_sub", "*": "_mul", "/": "_div"}
+_comparisons = {"<", ">", "==", "!="}
+
+
+class Unsupported(Exception):
+    pass
+
+
+class _Emitter:
+    def __init__(self, fn: monkey_obj.Function) -> None:
+        self.fn = fn
+        self.lines: List[str] = []
+        # Parameters are always integers, lets take the type of their value
+        self.types: Dict[str, str] = {p.value: INT for p in fn.params}
+
+    def line(self, depth: int, text: str) -> None:
+        self.lines.append("    " * depth + text)
+
+    def block(self, stmts: List[ast.Node], depth: int, tail: bool) -> None:
+        if tail and not stmts:
+            raise Unsupported("block evaluates to null")
+        if not stmts:
+            # Branches with no statements still need a body
+            self.line(depth, "pass")
+        for index, stmt in enumerate(stmts):
+            self.statement(stmt, depth, tail and index == len(stmts) - 1)
+
+    def statement(self, stmt: ast.Node, depth: int, tail: bool) -> None:
+        if isinstance(stmt, ast.ReturnStatement):
+            self.line(depth, f"return {self.int_expression(stmt.value)}")
+        elif isinstance(stmt, ast.LetStatement):
+            if tail:
+                raise Unsupported("block evaluates to null")
+            # A name bound in one branch would be an unassigned Python local
+            # when read after the if, so only the function body may bind
+            if depth > 1:
+                raise Unsupported(f"let inside a branch: {str(stmt)}")
+            value, value_type = self.expression(stmt.value)
+            self.types[stmt.name.value] = value_type
+            self.line(depth, f"v_{stmt.name.value} = {value}")
+        elif isinstance(stmt, ast.ExpressionStatement) and isinstance(
+            stmt.expression, ast.IfExpression
+        ):
+            self.if_statement(stmt.expression, depth, tail)
+        elif isinstance(stmt, ast.ExpressionStatement):
+            if tail:
+                self.line(depth, f"return {self.int_expression(stmt.expression)}")
+            else:
+                self.line(depth, self.expression(stmt.expression)[0])
+        else:
+            raise Unsupported(str(stmt))
+
+    def if_statement(self, node: ast.IfExpression, depth: int, tail: bool) -> None:
+        self.line(depth, f"if {self.bool_expression(node.condition)}:")
+        self.block(node.consequence.statements, depth + 1, tail)
+        if node.alternative is not None:
+            self.line(depth, "else:")
+            self.block(node.alternative.statements, depth + 1, tail)
+        elif tail:
+            raise Unsupported("if without else evaluates to null")
+
+    def int_expression(self, node: ast.Node) -> str:
+        code, code_type = self.expression(node)
+        if code_type != INT:
+            raise Unsupported(f"expected an integer: {str(node)}")
+        return code
+
+    def bool_expression(self, node: ast.Node) -> str:
+        code, code_type = self.expression(node)
+        if code_type != BOOL:
+            raise Unsupported(f"expected a boolean: {str(node)}")
+        return code
+
+    def expression(self, node: ast.Node):
+        if isinstance(node, ast.IntegerLiteral):
+            return repr(node.value), INT
+        elif isinstance(node, ast.Boolean):
+            return repr(node.value), BOOL
+        elif isinstance(node, ast.Identifier):
+            value_type = self.types.get(node.value)
+            if value_type is None:
+                raise Unsupported(f"free variable: {node.value}")
+            return f"v_{node.value}", value_type
+        elif isinstance(node, ast.PrefixExpression):
+            if node.operator == "-":
+                return f"_neg({self.int_expression(node.right)})", INT
+            return f"(not {self.bool_expression(node.right)})", BOOL
+        elif isinstance(node, (ast.InfixExpression, ast.AddK)):
+            return self.infix_expression(node)
+        elif isinstance(node, ast.CallExpression):
+            return self.self_call(node), INT
+        raise Unsupported(str(node))
+
+    def infix_expression(self, node: Union[ast.InfixExpression, ast.AddK]):
+        if node.operator in _arithmetic:
+            lhs = self.int_expression(node.left)
+            rhs = self.int_expression(node.right)
+            return f"{_arithmetic[node.operator]}({lhs}, {rhs})", INT
+        elif node.operator in _comparisons:
+            lhs, lhs_type = self.expression(node.left)
+            rhs, rhs_type = self.expression(node.right)
+            if lhs_type != rhs_type or (lhs_type == BOOL and node.operator in "<>"):
+                raise Unsupported(str(node))
+            return f"({lhs} {node.operator} {rhs})", BOOL
+        raise Unsupported(str(node))
+
+    def self_call(self, node: ast.CallExpression) -> str:
+        # The only call supported is recursion, the function has to be bound to
+        # a name that is still visible from its own environment
+        function = node.function
+        if (
+            not isinstance(function, ast.Identifier)
+            or function.value in self.types
+            or monkey_obj.lookup(self.fn.env, function.value) is not self.fn
+            or len(node.arguments) != len(self.fn.params)
+        ):
+            raise Unsupported(str(node))
+        args = ", ".join([self.int_expression(a) for a in node.arguments])
+        return f"f({args})"
+
+
+def emit_python(fn: monkey_obj.Function) -> Optional[str]:
+    emitter = _Emitter(fn)
+    params = ", ".join([f"v_{p.value}" for p in fn.params])
+    emitter.line(0, f"def f({params}):")
+    try:
+        emitter.block(fn.body.statements, 1, tail=True)
+    except Unsupported:
+        return None
+    return "\n".join(emitter.lines) + "\n"
+
+
+def compile_function(fn: monkey_obj.Function) -> Optional[Callable[..., int]]:
+    source = emit_python(fn)
+    if source is None:
+        return None
+    namespace: Dict[str, Any] = dict(_RUNTIME)
+    # Anything that goes wrong compiling leaves the function to the interpreter
+    try:
+        if numba is not None:
+            namespace = {name: numba.njit(h) for name, h in namespace.items()}
+        exec(source, namespace)
+        native = namespace["f"]
+        if numba is not None:
+            signature = numba.int64(*[numba.int64] * len(fn.params))
+            native = numba.njit(signature)(native)
+    except Exception:
+        return None
+    return native
+
+
+# Calls the compiled version of fn, None when it can't produce the result
+def call_native(fn: monkey_obj.Function, values: List[int]) -> Optional[int]:
+    if fn._native is None:
+        return None
+    # The only free names compiled code uses are recursive calls, which were
+    # resolved when it was compiled. Any of them since rebound means the
+    # compiled code would call the wrong function.
+    for name in fn.free:
+        if monkey_obj.lookup(fn.env, name) is not fn:
+            return None
+    for value in values:
+        if not INT_MIN <= value <= INT_MAX:
+            return None
+    try:
+        return fn._native(*values)
+    except OverflowError:
+        return None
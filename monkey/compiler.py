@@ -0,0 +1,312 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import monkey.ast as ast
+import monkey.object as monkey_obj
+from monkey.builtins import builtin_index
+
+# Each instruction is an (opcode, operand) pair, opcodes without an operand
+# carry None
+Instruction = Tuple[int, Any]
+
+(
+    OP_CONST,
+    OP_POP,
+    OP_ADD,
+    OP_SUB,
+    OP_MUL,
+    OP_DIV,
+    OP_EQ,
+    OP_NOT_EQ,
+    OP_LT,
+    OP_GT,
+    OP_MINUS,
+    OP_BANG,
+    OP_JMP,
+    OP_JMP_IF_FALSE,
+    OP_GET_GLOBAL,
+    OP_SET_GLOBAL,
+    OP_GET_BUILTIN,
+    OP_GET_LOCAL,
+    OP_SET_LOCAL,
+    OP_GET_FREE,
+    OP_CURRENT_CLOSURE,
+    OP_CLOSURE,
+    OP_ARRAY,
+    OP_HASH,
+    OP_INDEX,
+    OP_CALL,
+    OP_RETURN,
+) = range(27)
+
+infix_ops = {
+    "+": OP_ADD,
+    "-": OP_SUB,
+    "*": OP_MUL,
+    "/": OP_DIV,
+    "==": OP_EQ,
+    "!=": OP_NOT_EQ,
+    "<": OP_LT,
+    ">": OP_GT,
+}
+
+prefix_ops = {
+    "-": OP_MINUS,
+    "!": OP_BANG,
+}
+
+SymbolScope = str
+
+GLOBAL_SCOPE: SymbolScope = "GLOBAL"
+LOCAL_SCOPE: SymbolScope = "LOCAL"
+FREE_SCOPE: SymbolScope = "FREE"
+FUNCTION_SCOPE: SymbolScope = "FUNCTION"
+BUILTIN_SCOPE: SymbolScope = "BUILTIN"
+
+
+class CompileError(Exception):
+    pass
+
+
+class Symbol(NamedTuple):
+    name: str
+    scope: SymbolScope
+    index: Any
+
+
+class SymbolTable:
+    def __init__(self, outer: Optional["SymbolTable"] = None) -> None:
+        self.outer = outer
+        self.store: Dict[str, Symbol] = {}
+        self.num_definitions = 0
+        self.free_symbols: List[Symbol] = []
+
+    def define(self, name: str) -> Symbol:
+        if self.outer is None:
+            # Globals are kept by name so they persist across REPL inputs
+            symbol = Symbol(name, GLOBAL_SCOPE, name)
+        else:
+            existing = self.store.get(name)
+            if existing is not None and existing.scope == LOCAL_SCOPE:
+                return existing
+            symbol = Symbol(name, LOCAL_SCOPE, self.num_definitions)
+            self.num_definitions += 1
+        self.store[name] = symbol
+        return symbol
+
+    def define_function_name(self, name: str) -> Symbol:
+        symbol = Symbol(name, FUNCTION_SCOPE, 0)
+        self.store[name] = symbol
+        return symbol
+
+    def define_free(self, original: Symbol) -> Symbol:
+        self.free_symbols.append(original)
+        symbol = Symbol(original.name, FREE_SCOPE, len(self.free_symbols) - 1)
+        self.store[original.name] = symbol
+        return symbol
+
+    def resolve(self, name: str) -> Symbol:
+        symbol = self.store.get(name)
+        if symbol is not None:
+            return symbol
+        if self.outer is None:
+            # Globals shadow builtins, anything else unknown is assumed to be
+            # a global defined by the time the code runs
+            index = builtin_index.get(name)
+            if index is not None:
+                return Symbol(name, BUILTIN_SCOPE, index)
+            return Symbol(name, GLOBAL_SCOPE, name)
+        symbol = self.outer.resolve(name)
+        if symbol.scope == GLOBAL_SCOPE or symbol.scope == BUILTIN_SCOPE:
+            return symbol
+        return self.define_free(symbol)
+
+
+class Compiler:
+    def __init__(self, env: Optional[Dict[str, Any]] = None) -> None:
+        self.code: List[Instruction] = []
+        self.symbols = SymbolTable()
+        # Names already bound by earlier REPL input
+        for name in env or ():
+            self.symbols.define(name)
+
+    def emit(self, op: int, arg: Any = None) -> int:
+        self.code.append((op, arg))
+        return len(self.code) - 1
+
+    def patch(self, pos: int, arg: Any) -> None:
+        self.code[pos] = (self.code[pos][0], arg)
+
+    def compile(self, node: ast.Node) -> None:
+        try:
+            handler = _DISPATCH[type(node)]
+        except KeyError:
+            raise CompileError(f"unable to compile: {str(node)}") from None
+        handler(self, node)
+
+    def compile_program(self, node: ast.Program) -> None:
+        self.compile_body(node.statements)
+
+    def compile_body(self, stmts: List[ast.Node]) -> None:
+        # The value of the final expression statement is returned, matching
+        # the tree walking evaluator
+        self.compile_block_value(stmts)
+        self.emit(OP_RETURN)
+
+    def compile_block_value(self, stmts: List[ast.Node]) -> None:
+        for stmt in stmts:
+            self.compile(stmt)
+        if stmts and isinstance(stmts[-1], ast.ExpressionStatement):
+            self.code.pop()
+        else:
+            self.emit(OP_CONST, None)
+
+    def compile_expression_statement(self, node: ast.ExpressionStatement) -> None:
+        self.compile(node.expression)
+        self.emit(OP_POP)
+
+    def compile_block_statement(self, node: ast.BlockStatement) -> None:
+        self.compile_block_value(node.statements)
+
+    def compile_let_statement(self, node: ast.LetStatement) -> None:
+        if isinstance(node.value, ast.FunctionLiteral):
+            self.compile_function_literal(node.value, name=node.name.value)
+        else:
+            self.compile(node.value)
+        symbol = self.symbols.define(node.name.value)
+        if symbol.scope == GLOBAL_SCOPE:
+            self.emit(OP_SET_GLOBAL, symbol.index)
+        else:
+            self.emit(OP_SET_LOCAL, symbol.index)
+
+    def compile_return_statement(self, node: ast.ReturnStatement) -> None:
+        self.compile(node.value)
+        self.emit(OP_RETURN)
+
+    def compile_identifier(self, node: ast.Identifier) -> None:
+        self.load_symbol(self.symbols.resolve(node.value))
+
+    def load_symbol(self, symbol: Symbol) -> None:
+        if symbol.scope == GLOBAL_SCOPE:
+            self.emit(OP_GET_GLOBAL, symbol.index)
+        elif symbol.scope == BUILTIN_SCOPE:
+            self.emit(OP_GET_BUILTIN, symbol.index)
+        elif symbol.scope == LOCAL_SCOPE:
+            self.emit(OP_GET_LOCAL, symbol.index)
+        elif symbol.scope == FREE_SCOPE:
+            self.emit(OP_GET_FREE, symbol.index)
+        else:
+            self.emit(OP_CURRENT_CLOSURE)
+
+    def compile_integer_literal(self, node: ast.IntegerLiteral) -> None:
+        self.emit(OP_CONST, node.value)
+
+    def compile_string_literal(self, node: ast.StringLiteral) -> None:
+        self.emit(OP_CONST, node.value)
+
+    def compile_boolean(self, node: ast.Boolean) -> None:
+        self.emit(OP_CONST, node.value)
+
+    def compile_prefix_expression(self, node: ast.PrefixExpression) -> None:
+        self.compile(node.right)
+        op = prefix_ops.get(node.operator)
+        if op is None:
+            raise CompileError(f"unknown operator: {node.operator}")
+        self.emit(op)
+
+    def compile_infix_expression(self, node: ast.InfixExpression) -> None:
+        self.compile(node.left)
+        self.compile(node.right)
+        op = infix_ops.get(node.operator)
+        if op is None:
+            raise CompileError(f"unknown operator: {node.operator}")
+        self.emit(op)
+
+    def compile_if_expression(self, node: ast.IfExpression) -> None:
+        self.compile(node.condition)
+        jump_if_false = self.emit(OP_JMP_IF_FALSE)
+        self.compile(node.consequence)
+        jump = self.emit(OP_JMP)
+        self.patch(jump_if_false, len(self.code))
+        if node.alternative is None:
+            self.emit(OP_CONST, None)
+        else:
+            self.compile(node.alternative)
+        self.patch(jump, len(self.code))
+
+    def compile_function_literal(
+        self, node: ast.FunctionLiteral, name: Optional[str] = None
+    ) -> None:
+        outer_code, outer_symbols = self.code, self.symbols
+        self.code, self.symbols = [], SymbolTable(outer_symbols)
+
+        if name is not None:
+            self.symbols.define_function_name(name)
+        for param in node.params:
+            self.symbols.define(param.value)
+
+        self.compile_body(node.body.statements)
+
+        fn = monkey_obj.CompiledFunction(
+            instructions=self.code,
+            num_locals=self.symbols.num_definitions,
+            num_params=len(node.params),
+            literal=node,
+        )
+        free_symbols = self.symbols.free_symbols
+        self.code, self.symbols = outer_code, outer_symbols
+
+        for symbol in free_symbols:
+            self.load_symbol(symbol)
+        self.emit(OP_CLOSURE, (fn, len(free_symbols)))
+
+    def compile_call_expression(self, node: ast.CallExpression) -> None:
+        self.compile(node.function)
+        for arg in node.arguments:
+            self.compile(arg)
+        self.emit(OP_CALL, len(node.arguments))
+
+    def compile_array_literal(self, node: ast.ArrayLiteral) -> None:
+        for element in node.elements:
+            self.compile(element)
+        self.emit(OP_ARRAY, len(node.elements))
+
+    def compile_hash_literal(self, node: ast.HashLiteral) -> None:
+        for key, value in node.pairs:
+            self.compile(key)
+            self.compile(value)
+        self.emit(OP_HASH, len(node.pairs))
+
+    def compile_index_expression(self, node: ast.IndexExpression) -> None:
+        self.compile(node.left)
+        self.compile(node.index)
+        self.emit(OP_INDEX)
+
+
+_DISPATCH: Dict[type, Callable[[Compiler, Any], None]] = {
+    ast.Program: Compiler.compile_program,
+    ast.ExpressionStatement: Compiler.compile_expression_statement,
+    ast.BlockStatement: Compiler.compile_block_statement,
+    ast.LetStatement: Compiler.compile_let_statement,
+    ast.ReturnStatement: Compiler.compile_return_statement,
+    ast.Identifier: Compiler.compile_identifier,
+    ast.IntegerLiteral: Compiler.compile_integer_literal,
+    ast.StringLiteral: Compiler.compile_string_literal,
+    ast.Boolean: Compiler.compile_boolean,
+    ast.PrefixExpression: Compiler.compile_prefix_expression,
+    ast.InfixExpression: Compiler.compile_infix_expression,
+    ast.AddK: Compiler.compile_infix_expression,
+    ast.IfExpression: Compiler.compile_if_expression,
+    ast.FunctionLiteral: Compiler.compile_function_literal,
+    ast.CallExpression: Compiler.compile_call_expression,
+    ast.ArrayLiteral: Compiler.compile_array_literal,
+    ast.HashLiteral: Compiler.compile_hash_literal,
+    ast.IndexExpression: Compiler.compile_index_expression,
+}
+
+
+def compile(
+    program: ast.Program, env: Optional[Dict[str, Any]] = None
+) -> List[Instruction]:
+    compiler = Compiler(env)
+    compiler.compile(program)
+    return compiler.code
@@ -1,103 +1,180 @@
-from collections import ChainMap
-from typing import List, NamedTuple
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, cast
 
 import monkey.ast as ast
+import monkey.codegen as codegen
 import monkey.object as monkey_obj
 from monkey.builtins import builtins
 
+# Maximum number of memoized results kept per function
+FUNCTION_CACHE_SIZE = 1024
+
+# Arguments and array elements are independent of each other, without a GIL
+# enough of them are worth evaluating on a thread pool. That's only done when
+# the only calls they make are to pure builtins, anything else may print, push
+# onto shared array storage or update a function's memo.
+PARALLEL_MIN_EXPRESSIONS = 4
+_PARALLEL = not getattr(sys, "_is_gil_enabled", lambda: True)()
+# Builtins whose results only depend on their arguments and which don't print
+# or modify anything
+_PURE_BUILTINS = frozenset({"len", "first", "last", "rest"})
+_executor: Optional[ThreadPoolExecutor] = None
+_worker = threading.local()
+
+# Indexed by a Python bool to get the matching singleton
+_BOOL = (monkey_obj.FALSE, monkey_obj.TRUE)
+
 
 def Eval(node: ast.Node, env) -> monkey_obj.Object:
+    try:
+        handler = _DISPATCH[type(node)]
+    except KeyError:
+        raise NotImplementedError(str(node), node.token_literal()) from None
+    return handler(node, env)
 
-    if isinstance(node, ast.Program):
-        return eval_program(node.statements, env)
 
-    elif isinstance(node, ast.HashLiteral):
-        return eval_hash_literal(node, env)
+def _eval_program(node: ast.Program, env) -> monkey_obj.Object:
+    return eval_program(node.statements, env)
 
-    elif isinstance(node, ast.ArrayLiteral):
-        elements = [Eval(e, env) for e in node.elements]
-        if len(elements) == 1 and isinstance(elements[0], monkey_obj.Error):
-            return elements[0]
-        return monkey_obj.Array(elements=elements)
 
-    elif isinstance(node, ast.IndexExpression):
-        left = Eval(node.left, env)
-        if left is not None and isinstance(left, monkey_obj.Error):
-            return left
+def _eval_hash_literal(node: ast.HashLiteral, env) -> monkey_obj.Object:
+    return eval_hash_literal(node, env)
 
-        index = Eval(node.index, env)
-        if index is not None and isinstance(index, monkey_obj.Error):
-            return index
 
-        return eval_index_expression(left, index)
+def _eval_array_literal(node: ast.ArrayLiteral, env) -> monkey_obj.Object:
+    elements = eval_expressions(node, node.elements, env)
+    if len(elements) == 1 and isinstance(elements[0], monkey_obj.Error):
+        return elements[0]
+    return monkey_obj.Array(elements=elements)
 
-    elif isinstance(node, ast.StringLiteral):
-        return monkey_obj.String(value=node.value)
 
-    elif isinstance(node, ast.CallExpression):
-        function = Eval(node.function, env)
-        if function is not None and isinstance(function, monkey_obj.Error):
-            return function
+def _eval_index_expression(node: ast.IndexExpression, env) -> monkey_obj.Object:
+    left = Eval(node.left, env)
+    if left is not None and isinstance(left, monkey_obj.Error):
+        return left
 
-        args = [Eval(e, env) for e in node.arguments]
-        for arg in args:
-            if arg is not None and isinstance(function, monkey_obj.Error):
-                return arg
-        return apply_function(function, args)
+    index = Eval(node.index, env)
+    if index is not None and isinstance(index, monkey_obj.Error):
+        return index
 
-    elif isinstance(node, ast.FunctionLiteral):
-        params = node.params
-        body = node.body
-        return monkey_obj.Function(params, env, body)
+    return eval_index_expression(left, index)
 
-    elif isinstance(node, ast.BlockStatement):
-        return eval_block_statements(node.statements, env)
 
-    elif isinstance(node, ast.IfExpression):
-        return eval_if_expression(node, env)
+def _eval_string_literal(node: ast.StringLiteral, env) -> monkey_obj.Object:
+    return monkey_obj.make_str(node.value)
 
-    elif isinstance(node, ast.Identifier):
-        return eval_identifier(node, env)
 
-    elif isinstance(node, ast.LetStatement):
-        val = Eval(node.value, env)
-        if val is not None and isinstance(val, monkey_obj.Error):
-            return val
-        env[node.name.value] = val
-        return monkey_obj.NULL
+def _eval_call_expression(node: ast.CallExpression, env) -> monkey_obj.Object:
+    function = Eval(node.function, env)
+    if function is not None and isinstance(function, monkey_obj.Error):
+        return function
+
+    args = eval_expressions(node, node.arguments, env)
+    for arg in args:
+        if arg is not None and isinstance(function, monkey_obj.Error):
+            return arg
+    return apply_function(function, args)
 
-    elif isinstance(node, ast.ReturnStatement):
-        val = Eval(node.value, env)
-        if val is not None and isinstance(val, monkey_obj.Error):
-            return val
-        return monkey_obj.ReturnValue(value=val)
 
-    elif isinstance(node, ast.ExpressionStatement):
-        return Eval(node.expression, env)
+def _eval_function_literal(node: ast.FunctionLiteral, env) -> monkey_obj.Object:
+    if node._free is None:
+        node._free = tuple(ast.free_identifiers(node))
+    return monkey_obj.Function(node.params, env, node.body, free=node._free)
 
-    elif isinstance(node, ast.Boolean):
-        return native_bool_to_boolean_object(node.value)
 
-    elif isinstance(node, ast.IntegerLiteral):
-        return monkey_obj.Integer(value=node.value)
+def eval_expressions(node, exprs: List[ast.Node], env) -> List[monkey_obj.Object]:
+    # Workers evaluate nested expressions themselves, waiting on the pool from
+    # inside it could deadlock
+    if (
+        not _PARALLEL
+        or len(exprs) < PARALLEL_MIN_EXPRESSIONS
+        or getattr(_worker, "active", False)
+    ):
+        return [Eval(e, env) for e in exprs]
+    if node._pure is None:
+        node._pure = all(
+            isinstance(call.function, ast.Identifier)
+            and call.function.value in _PURE_BUILTINS
+            for call in ast.calls(exprs)
+        )
+    # The builtins' names can be rebound to functions which aren't pure
+    if not node._pure or any(
+        monkey_obj.lookup(env, name) is not None for name in _PURE_BUILTINS
+    ):
+        return [Eval(e, env) for e in exprs]
+
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=os.cpu_count(), initializer=_start_worker
+        )
+    return list(_executor.map(Eval, exprs, [env] * len(exprs)))
 
-    elif isinstance(node, ast.PrefixExpression):
-        right = Eval(node.right, env)
-        if right is not None and isinstance(right, monkey_obj.Error):
-            return val
-        return eval_prefix_expression(node.operator, right)
 
-    elif isinstance(node, ast.InfixExpression):
-        left = Eval(node.left, env)
-        if left is not None and isinstance(left, monkey_obj.Error):
-            return left
-        right = Eval(node.right, env)
-        if right is not None and isinstance(right, monkey_obj.Error):
-            return val
-        return eval_infix_expression(node.operator, left, right)
+def _start_worker() -> None:
+    _worker.active = True
 
-    else:
-        raise NotImplementedError(str(node), node.token_literal())
+
+def _eval_block_statement(node: ast.BlockStatement, env) -> monkey_obj.Object:
+    return eval_block_statements(node.statements, env)
+
+
+def _eval_let_statement(node: ast.LetStatement, env) -> monkey_obj.Object:
+    val = Eval(node.value, env)
+    if val is not None and isinstance(val, monkey_obj.Error):
+        return val
+    env[node.name.value] = val
+    return monkey_obj.NULL
+
+
+def _eval_return_statement(node: ast.ReturnStatement, env) -> monkey_obj.Object:
+    val = Eval(node.value, env)
+    if val is not None and isinstance(val, monkey_obj.Error):
+        return val
+    return monkey_obj.ReturnValue(value=val)
+
+
+def _eval_expression_statement(node: ast.ExpressionStatement, env) -> monkey_obj.Object:
+    return Eval(node.expression, env)
+
+
+def _eval_boolean(node: ast.Boolean, env) -> monkey_obj.Object:
+    return _BOOL[node.value]
+
+
+def _eval_integer_literal(node: ast.IntegerLiteral, env) -> monkey_obj.Object:
+    return monkey_obj.make_int(node.value)
+
+
+def _eval_prefix_expression(node: ast.PrefixExpression, env) -> monkey_obj.Object:
+    right = Eval(node.right, env)
+    if right is not None and isinstance(right, monkey_obj.Error):
+        return right
+    return eval_prefix_expression(node.operator, right)
+
+
+def _eval_add_k(node: ast.AddK, env) -> monkey_obj.Object:
+    # Any, since the TAG check below narrows it to an Integer, not mypy
+    left: Any = Eval(node.left, env)
+    if left.TAG == monkey_obj.INTEGER_TAG:
+        return monkey_obj.make_int(left.value + node.constant)
+    if left.CONTROL == monkey_obj.ERROR_CONTROL:
+        return left
+    return eval_infix_expression(node.operator, left, Eval(node.right, env))
+
+
+def _eval_infix_expression(node: ast.InfixExpression, env) -> monkey_obj.Object:
+    left = Eval(node.left, env)
+    if left is not None and isinstance(left, monkey_obj.Error):
+        return left
+    right = Eval(node.right, env)
+    if right is not None and isinstance(right, monkey_obj.Error):
+        return right
+    return eval_infix_expression(node.operator, left, right)
 
 
 def apply_function(
@@ -105,17 +182,67 @@ def apply_function(
 ) -> monkey_obj.Object:
 
     if isinstance(fn, monkey_obj.Function):
-        func_environment = {
-            param.value: args[index] for index, param in enumerate(fn.params)
-        }
-        evaluated = Eval(fn.body, ChainMap(func_environment, fn.env))
-        return unwrap_return_value(evaluated)
+        key = None
+        cache = None
+        if _memoizable(fn):
+            try:
+                key = tuple((type(a), a.value) for a in cast(List[Any], args))
+            except (AttributeError, TypeError):
+                # Arrays, hashes and functions aren't usable as cache keys
+                pass
+            else:
+                cache = fn._cache
+                if cache is None:
+                    cache = fn._cache = OrderedDict()
+                elif key in cache:
+                    cache.move_to_end(key)
+                    return cache[key]
+
+        result: monkey_obj.Object
+        native = None
+        jit = fn._native is not None or codegen.JIT_ENABLED
+        if jit and len(args) == len(fn.params):
+            values = [a.value for a in args if type(a) is monkey_obj.Integer]
+            # Only calls the compiled code could take count towards compiling
+            if len(values) == len(args):
+                if fn._native is None:
+                    fn.call_count += 1
+                    if fn.call_count == codegen.JIT_THRESHOLD:
+                        fn._native = codegen.compile_function(fn)
+                if fn._native is not None:
+                    native = codegen.call_native(fn, values)
+        if native is not None:
+            result = monkey_obj.make_int(native)
+        else:
+            # Parameters plus the PARENT link to the defining environment
+            frame: Dict[str, Any] = {
+                param.value: args[index] for index, param in enumerate(fn.params)
+            }
+            frame[monkey_obj.PARENT] = fn.env
+            evaluated = Eval(fn.body, frame)
+            result = unwrap_return_value(evaluated)
+
+        if key is not None and cache is not None:
+            cache[key] = result
+            if len(cache) > FUNCTION_CACHE_SIZE:
+                cache.popitem(last=False)
+        return result
     elif isinstance(fn, monkey_obj.Builtin):
         return fn.fn(args)
     else:
         return monkey_obj.Error(f"not a function: {type(fn)}")
 
 
+# Whether every free name of fn resolves to itself or a pure builtin. Checked
+# on each call since names can be rebound after the function is defined.
+def _memoizable(fn: monkey_obj.Function) -> bool:
+    for name in fn.free:
+        val = monkey_obj.lookup(fn.env, name)
+        if val is not fn and (val is not None or name not in _PURE_BUILTINS):
+            return False
+    return True
+
+
 def unwrap_return_value(obj: monkey_obj.Object) -> monkey_obj.Object:
     if isinstance(obj, monkey_obj.ReturnValue):
         return obj.value
@@ -124,6 +251,8 @@ def unwrap_return_value(obj: monkey_obj.Object) -> monkey_obj.Object:
 
 def eval_identifier(node: ast.Identifier, env):
     val = env.get(node.value)
+    if val is None:
+        val = monkey_obj.lookup(env.get(monkey_obj.PARENT), node.value)
     if val is not None:
         return val
 
@@ -134,29 +263,25 @@ def eval_identifier(node: ast.Identifier, env):
     return monkey_obj.Error(f"identifier not found: {node.value}")
 
 
-def native_bool_to_boolean_object(value: bool) -> monkey_obj.Boolean:
-    return monkey_obj.TRUE if value else monkey_obj.FALSE
-
-
 def eval_program(stmts: List[ast.Node], env) -> monkey_obj.Object:
+    result: monkey_obj.Object = monkey_obj.NULL
     for stmt in stmts:
         result = Eval(stmt, env)
-        # If the statement was a return then exit early
-        if isinstance(result, monkey_obj.ReturnValue):
-            return result.value
-        elif isinstance(result, monkey_obj.Error):
-            return result
+        # If the statement was a return or an error then exit early
+        control = result.CONTROL
+        if control:
+            if control == monkey_obj.ERROR_CONTROL:
+                return result
+            return cast(monkey_obj.ReturnValue, result).value
     return result
 
 
 def eval_block_statements(stmts, env) -> monkey_obj.Object:
+    result: monkey_obj.Object = monkey_obj.NULL
     for stmt in stmts:
         result = Eval(stmt, env)
-        # If the statement was a return then exit early
-        if result is not None and (
-            isinstance(result, monkey_obj.ReturnValue)
-            or isinstance(result, monkey_obj.Error)
-        ):
+        # If the statement was a return or an error then exit early
+        if result.CONTROL:
             return result
     return result
 
@@ -171,81 +296,85 @@ def eval_prefix_expression(operator: str, rhs=monkey_obj.Object) -> monkey_obj.O
 
 
 def eval_bang_operator(rhs: monkey_obj.Object) -> monkey_obj.Object:
-    if rhs is monkey_obj.TRUE:
-        return monkey_obj.FALSE
-    elif rhs is monkey_obj.FALSE:
-        return monkey_obj.TRUE
-    elif rhs is monkey_obj.NULL:
-        return monkey_obj.TRUE
-    else:
-        return monkey_obj.FALSE
+    return _BOOL[rhs is monkey_obj.FALSE or rhs is monkey_obj.NULL]
 
 
 def eval_minus_prefix_operator(rhs: monkey_obj.Object) -> monkey_obj.Object:
-    if not isinstance(rhs, monkey_obj.Integer):
+    if rhs.TAG != monkey_obj.INTEGER_TAG:
         return monkey_obj.Error(f"unknown operator: -{rhs.object_type()}")
-    return monkey_obj.Integer(value=-(rhs.value))
+    return monkey_obj.make_int(-cast(monkey_obj.Integer, rhs).value)
 
 
 def eval_infix_expression(
     operator: str, lhs: monkey_obj.Object, rhs: monkey_obj.Object
 ) -> monkey_obj.Object:
-    if isinstance(lhs, monkey_obj.Integer) and isinstance(rhs, monkey_obj.Integer):
-        return eval_integer_infix_expression(operator, lhs, rhs)
-    elif type(lhs) != type(rhs):
+    tag = lhs.TAG
+    if tag == monkey_obj.INTEGER_TAG and rhs.TAG == monkey_obj.INTEGER_TAG:
+        return eval_integer_infix_expression(
+            operator,
+            cast(monkey_obj.Integer, lhs).value,
+            cast(monkey_obj.Integer, rhs).value,
+        )
+    elif tag != rhs.TAG:
         return monkey_obj.Error(
             f"type mismatch: {lhs.object_type()} {operator} {rhs.object_type()}"
         )
 
-    elif isinstance(lhs, monkey_obj.String) and isinstance(rhs, monkey_obj.String):
+    elif tag == monkey_obj.STRING_TAG:
         if operator != "+":
             return monkey_obj.Error(
                 f"unknown operator: {lhs.object_type()} {operator} {rhs.object_type()}"
             )
-        return monkey_obj.String(value=lhs.value + rhs.value)
+        return monkey_obj.make_str(
+            cast(monkey_obj.String, lhs).value + cast(monkey_obj.String, rhs).value
+        )
 
     elif operator == "==":
-        return native_bool_to_boolean_object(lhs == rhs)
+        return _BOOL[lhs == rhs]
     elif operator == "!=":
-        return native_bool_to_boolean_object(lhs != rhs)
+        return _BOOL[lhs != rhs]
     return monkey_obj.Error(
         f"unknown operator: {lhs.object_type()} {operator} {rhs.object_type()}"
     )
 
 
+# Operands are unwrapped by the caller so only the result gets boxed
 def eval_integer_infix_expression(
-    operator: str, lhs: monkey_obj.Integer, rhs: monkey_obj.Integer
+    operator: str, lhs: int, rhs: int
 ) -> monkey_obj.Object:
     if operator == "+":
-        return monkey_obj.Integer(value=lhs.value + rhs.value)
+        return monkey_obj.make_int(lhs + rhs)
     elif operator == "-":
-        return monkey_obj.Integer(value=lhs.value - rhs.value)
+        return monkey_obj.make_int(lhs - rhs)
     elif operator == "*":
-        return monkey_obj.Integer(value=lhs.value * rhs.value)
+        return monkey_obj.make_int(lhs * rhs)
     elif operator == "/":
-        return monkey_obj.Integer(value=lhs.value // rhs.value)
+        return monkey_obj.make_int(lhs // rhs)
     elif operator == "<":
-        return native_bool_to_boolean_object(lhs.value < rhs.value)
+        return _BOOL[lhs < rhs]
     elif operator == ">":
-        return native_bool_to_boolean_object(lhs.value > rhs.value)
+        return _BOOL[lhs > rhs]
     elif operator == "==":
-        return native_bool_to_boolean_object(lhs.value == rhs.value)
+        return _BOOL[lhs == rhs]
     elif operator == "!=":
-        return native_bool_to_boolean_object(lhs.value != rhs.value)
+        return _BOOL[lhs != rhs]
     else:
         return monkey_obj.Error(
-            f"unknown operator: {lhs.object_type()} {operator} {rhs.object_type()}"
+            f"unknown operator: {monkey_obj.INTEGER_OBJ} {operator} {monkey_obj.INTEGER_OBJ}"
         )
 
 
 def eval_index_expression(
     left: monkey_obj.Object, index: monkey_obj.Object
 ) -> monkey_obj.Object:
-    if isinstance(left, monkey_obj.Array) and isinstance(index, monkey_obj.Integer):
-        return eval_array_index_expression(left, index)
+    tag = left.TAG
+    if tag == monkey_obj.ARRAY_TAG and index.TAG == monkey_obj.INTEGER_TAG:
+        return eval_array_index_expression(
+            cast(monkey_obj.Array, left), cast(monkey_obj.Integer, index)
+        )
 
-    elif isinstance(left, monkey_obj.Hash):
-        return eval_hash_index_expression(left, index)
+    elif tag == monkey_obj.HASH_TAG:
+        return eval_hash_index_expression(cast(monkey_obj.Hash, left), index)
     else:
         return monkey_obj.Error(f"index operator not supported: {type(left)}")
 
@@ -253,16 +382,19 @@ def eval_index_expression(
 def eval_array_index_expression(
     array_obj: monkey_obj.Array, index_obj: monkey_obj.Integer
 ) -> monkey_obj.Object:
-    max_index = len(array_obj.elements) - 1
+    max_index = array_obj.length() - 1
     if index_obj.value < 0 or index_obj.value > max_index:
         return monkey_obj.NULL
-    return array_obj.elements[index_obj.value]
+    return array_obj.elements[array_obj.start + index_obj.value]
 
 
 def eval_hash_index_expression(
     hash: monkey_obj.Hash, index_obj: monkey_obj.Object
 ) -> monkey_obj.Object:
-    pair = hash.pairs.get(index_obj.value)
+    key = monkey_obj.hash_key(index_obj)
+    if key is None:
+        return monkey_obj.Error(f"unusable as hash key: {index_obj.object_type()}")
+    pair = hash.pairs.get(key)
     if pair is None:
         return monkey_obj.NULL
     return pair
@@ -282,13 +414,40 @@ def eval_if_expression(if_exp: ast.IfExpression, env) -> monkey_obj.Object:
 
 def eval_hash_literal(node: ast.HashLiteral, env) -> monkey_obj.Object:
     pairs = {}
-    for key, val in node.pairs.items():
-        key = Eval(key, env)
+    for key_node, val in node.pairs:
+        key = Eval(key_node, env)
         if key is not None and isinstance(key, monkey_obj.Error):
             return key
+        hashed = monkey_obj.hash_key(key)
+        if hashed is None:
+            return monkey_obj.Error(f"unusable as hash key: {key.object_type()}")
         value = Eval(val, env)
-        if value is not None and isinstance(key, monkey_obj.Error):
+        if value is not None and isinstance(value, monkey_obj.Error):
             return value
 
-        pairs[key.value] = value
+        pairs[hashed] = value
     return monkey_obj.Hash(pairs=pairs)
+
+
+# Handlers are keyed on the concrete node class, AST nodes are never subclassed
+# so an exact type lookup is equivalent to the old isinstance chain
+_DISPATCH: Dict[type, Callable[[Any, Any], monkey_obj.Object]] = {
+    ast.Program: _eval_program,
+    ast.HashLiteral: _eval_hash_literal,
+    ast.ArrayLiteral: _eval_array_literal,
+    ast.IndexExpression: _eval_index_expression,
+    ast.StringLiteral: _eval_string_literal,
+    ast.CallExpression: _eval_call_expression,
+    ast.FunctionLiteral: _eval_function_literal,
+    ast.BlockStatement: _eval_block_statement,
+    ast.IfExpression: eval_if_expression,
+    ast.Identifier: eval_identifier,
+    ast.LetStatement: _eval_let_statement,
+    ast.ReturnStatement: _eval_return_statement,
+    ast.ExpressionStatement: _eval_expression_statement,
+    ast.Boolean: _eval_boolean,
+    ast.IntegerLiteral: _eval_integer_literal,
+    ast.PrefixExpression: _eval_prefix_expression,
+    ast.InfixExpression: _eval_infix_expression,
+    ast.AddK: _eval_add_k,
+}
@@ -1,111 +1,70 @@
-from typing import Optional
+import re
+import sys
+from typing import Iterator, List, cast
 
-import monkey.ast as ast
 import monkey.token as token
 
-
-# [TODO]
-# - Would this be possible to do without mutable state,
-# - Can we wrap this is a custom generator that consumes a byte at a time (+ 1
-# extra byte for peek char)
+# A single alternation of every token production, matched by the regex engine
+# rather than a character at a time in Python. Anything that doesn't match
+# another production is emitted as an illegal token.
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<WS>\s+)
+    |(?P<IDENT>[^\W\d]\w*)
+    |(?P<INT>\d+)
+    |"(?P<STRING>[^"]*)"
+    |(?P<SYM>==|!=|[-+*/<>=!(){}\[\],:;])
+    |(?P<ILLEGAL>.)
+    """,
+    re.VERBOSE,
+)
+
+# Keywords and symbols always produce the same token, so one instance of each
+# is shared rather than allocating a new one every time
+_FIXED_TOKENS = {
+    literal: token.Token(tok_type, literal)
+    for literal, tok_type in (*token.keywords.items(), *token.token_table.items())
+}
+_EOF_TOKEN = token.Token(token.EOF, "")
 
 
 class Lexer:
     input: str
-    position: int
-    read_position: int
-    ch: Optional[str]
 
     def __init__(self, input: str) -> None:
         self.input = input
-        self.position = 0
-        self.read_position = 0
-        self.ch = ""
-        self.read_char()
-
-    def read_char(self) -> None:
-        if self.read_position >= len(self.input):
-            self.ch = None
-        else:
-            self.ch = self.input[self.read_position]
-        self.position = self.read_position
-        self.read_position += 1
-
-    def peek_char(self) -> Optional[str]:
-        if self.read_position >= len(self.input):
-            self.ch = None
-            return None
-        else:
-            return self.input[self.read_position]
-
-    def skip_whitespace(self) -> None:
-        while self.ch is not None and self.ch.isspace():
-            self.read_char()
+        self._matches: Iterator[re.Match] = _TOKEN_RE.finditer(input)
 
     def next_token(self) -> token.Token:
-        # Consume space characters to advance the lexer
-        self.skip_whitespace()
-
-        if self.ch is None:
-            return token.Token(token.EOF, "")
-        elif self.ch == "[":
-            tok = token.Token(token.LBRACKET, self.ch)
-            self.read_char()
-            return tok
-        elif self.ch == "]":
-            tok = token.Token(token.RBRACKET, self.ch)
-            self.read_char()
-            return tok
-        elif self.ch == ":":
-            tok = token.Token(token.COLON, self.ch)
-            self.read_char()
-            return tok
-        elif self.ch == '"':
-            literal = self.read_string()
-            self.read_char()
-            return token.Token(tok_type=token.STRING, literal=literal)
-
-        # Attempt to lookup common token types
-        tok_type = token.token_table.get(self.ch)
-        if tok_type is not None:
-            tok = token.Token(tok_type, self.ch)
-
-            if self.ch == "=" and self.peek_char() == "=":
-                self.read_char()
-                tok = token.Token(token.EQ, "==")
-            elif self.ch == "!" and self.peek_char() == "=":
-                self.read_char()
-                tok = token.Token(token.NOT_EQ, "!=")
-
-        else:
-            # If token not found
-            if self.ch.isalpha():
-                literal = self.read_identifier()
-                return token.Token(token.lookup_ident(literal), literal)
-            elif self.ch.isdigit():
-                return token.Token(token.INT, self.read_number())
-            else:
-                tok = token.Token(token.ILLEGAL, self.ch)
-
-        self.read_char()
-        return tok
-
-    def read_string(self) -> str:
-        position = self.position + 1
+        for match in self._matches:
+            # Every alternative is a named group, so one of them matched
+            kind = cast(str, match.lastgroup)
+            if kind == "WS":
+                continue
+            literal = match.group(kind)
+            if kind == "IDENT":
+                keyword = _FIXED_TOKENS.get(literal)
+                if keyword is not None:
+                    return keyword
+                # Identifiers end up as environment keys, interning them makes
+                # those lookups an identity check
+                return token.Token(token.IDENT, sys.intern(literal))
+            elif kind == "INT":
+                return token.Token(token.INT, literal)
+            elif kind == "STRING":
+                return token.Token(token.STRING, literal)
+            elif kind == "SYM":
+                return _FIXED_TOKENS[literal]
+            return token.Token(token.ILLEGAL, literal)
+        return _EOF_TOKEN
+
+    def __iter__(self) -> Iterator[token.Token]:
         while True:
-            self.read_char()
-            if self.ch == '"' or self.ch == 0:
-                break
-        return self.input[position : self.position]
+            tok = self.next_token()
+            yield tok
+            if tok.tok_type is token.EOF:
+                return
 
-    def read_number(self) -> str:
-        position = self.position
-        while self.ch is not None and self.ch.isdigit():
-            self.read_char()
-        return self.input[position : self.position]
 
-    def read_identifier(self) -> str:
-        position = self.position
-        while self.ch is not None and self.ch.isalpha():
-            self.read_char()
-        return self.input[position : self.position]
+def tokenize(source: str) -> List[token.Token]:
+    return list(Lexer(source))
@@ -12,9 +12,11 @@ from prompt_toolkit.lexers import PygmentsLexer
 from prompt_toolkit.styles import Style
 from pygments.lexers.html import JavascriptLexer
 
-from monkey.eval import Eval
-from monkey.lexer import Lexer
+from monkey import vm
+from monkey.compiler import CompileError, compile
+from monkey.lexer import tokenize
 from monkey.parser import Parser
+from monkey.transform import fold_constants, peephole
 import monkey.token as token
 
 # [TODO]
@@ -56,13 +58,17 @@ def main():
         except EOFError:
             break
         else:
-            lexer = Lexer(scanned)
-            parser = Parser(lexer)
-            program = parser.parse_program()
+            parser = Parser(tokenize(scanned))
+            program = peephole(fold_constants(parser.parse_program()))
             if parser.errors:
-                for error in parser.errors:
+                for error in parser.errors_formatted:
                     print(error)
-            evaluated = Eval(program, env)
+            try:
+                code = compile(program, env)
+            except CompileError as e:
+                print(e)
+                continue
+            evaluated = vm.run(code, env)
             session.completer = WordCompleter(list(set(token.keywords) | set(env)))
             if evaluated is not None:
                 print(evaluated.inspect())
@@ -1,6 +1,7 @@
-from typing import List, Dict, Any, Callable
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, NamedTuple, Optional, Tuple, cast
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from monkey import ast as ast
 
@@ -11,14 +12,40 @@ HASH_OBJ = "HASH"
 STRING_OBJ = "STRING"
 BUILTIN_OBJ = "BUILTIN"
 FUNCTION_OBJ = "FUNCTION"
+COMPILED_FUNCTION_OBJ = "COMPILED_FUNCTION"
 ERROR_OBJ = "ERROR"
 RETURN_VALUE_OBJ = "RETURN_VALUE"
 INTEGER_OBJ = "INTEGER"
 BOOLEAN_OBJ = "BOOLEAN"
 NULL_OBJ = "NULL"
 
+# Values of the CONTROL class attribute, a non zero value means evaluation of
+# the enclosing block has to stop
+NORMAL_CONTROL = 0
+RETURN_CONTROL = 1
+ERROR_CONTROL = 2
+
+# Values of the TAG class attribute, a small integer identifying the kind of
+# an object which is cheaper to compare than calling isinstance
+NULL_TAG = 0
+INTEGER_TAG = 1
+BOOLEAN_TAG = 2
+STRING_TAG = 3
+ARRAY_TAG = 4
+HASH_TAG = 5
+FUNCTION_TAG = 6
+BUILTIN_TAG = 7
+RETURN_VALUE_TAG = 8
+ERROR_TAG = 9
+COMPILED_FUNCTION_TAG = 10
+
 
 class Object(ABC):
+    __slots__ = ()
+
+    CONTROL = NORMAL_CONTROL
+    TAG = NULL_TAG
+
     @abstractmethod
     def object_type(self) -> ObjectType:
         ...
@@ -28,10 +55,12 @@ class Object(ABC):
         ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Integer(Object):
     value: int
 
+    TAG = INTEGER_TAG
+
     def object_type(self) -> ObjectType:
         return INTEGER_OBJ
 
@@ -39,10 +68,12 @@ class Integer(Object):
         return str(self.value)
 
 
-@dataclass
+@dataclass(slots=True)
 class Boolean(Object):
     value: bool
 
+    TAG = BOOLEAN_TAG
+
     def inspect(self) -> str:
         return str(self.value).lower()
 
@@ -53,7 +84,7 @@ class Boolean(Object):
         return BOOLEAN_OBJ
 
 
-@dataclass
+@dataclass(slots=True)
 class NullObject(Object):
     def inspect(self) -> str:
         return "null"
@@ -65,10 +96,13 @@ class NullObject(Object):
         return NULL_OBJ
 
 
-@dataclass
+@dataclass(slots=True)
 class ReturnValue(Object):
     value: Object
 
+    CONTROL = RETURN_CONTROL
+    TAG = RETURN_VALUE_TAG
+
     def inspect(self) -> str:
         return self.value.inspect()
 
@@ -76,10 +110,13 @@ class ReturnValue(Object):
         return RETURN_VALUE_OBJ
 
 
-@dataclass
+@dataclass(slots=True)
 class Error(Object):
     msg: str
 
+    CONTROL = ERROR_CONTROL
+    TAG = ERROR_TAG
+
     def inspect(self) -> str:
         return "ERROR: " + self.msg
 
@@ -87,11 +124,23 @@ class Error(Object):
         return ERROR_OBJ
 
 
-@dataclass
+@dataclass(slots=True)
 class Function(Object):
     params: List[ast.Identifier]
     env: Dict
     body: ast.BlockStatement
+    # Names the body uses without binding them. When each of those is a
+    # builtin without side effects or this function itself, results only
+    # depend on the arguments and are memoized by their values in `_cache`
+    free: Tuple[str, ...] = field(default=(), compare=False, repr=False)
+    _cache: Optional[OrderedDict] = field(default=None, compare=False, repr=False)
+    # Calls counted towards compiling the function natively, see monkey.codegen
+    call_count: int = field(default=0, compare=False, repr=False)
+    _native: Optional[Callable[..., int]] = field(
+        default=None, compare=False, repr=False
+    )
+
+    TAG = FUNCTION_TAG
 
     def inspect(self) -> str:
         return f"fn({', '.join([str(s) for s in self.params])}){str(self.body)}"
@@ -100,10 +149,12 @@ class Function(Object):
         return FUNCTION_OBJ
 
 
-@dataclass
+@dataclass(slots=True)
 class String(Object):
     value: str
 
+    TAG = STRING_TAG
+
     def object_type(self) -> ObjectType:
         return STRING_OBJ
 
@@ -111,10 +162,12 @@ class String(Object):
         return self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class Builtin(Object):
     fn: Callable[[List[Object]], Object]
 
+    TAG = BUILTIN_TAG
+
     def object_type(self) -> ObjectType:
         return BUILTIN_OBJ
 
@@ -122,20 +175,50 @@ class Builtin(Object):
         return "builtin function"
 
 
-@dataclass
+# Arrays are views over elements[start:end] of a list that may be shared with
+# other arrays. The shared list only ever grows, so `push` can append in place
+# whenever no other array extends past the end of this one, and `rest` just
+# narrows the view.
+@dataclass(slots=True, eq=False)
 class Array(Object):
     elements: List[Object]
+    start: int = 0
+    end: int = -1
+
+    TAG = ARRAY_TAG
+
+    def __post_init__(self) -> None:
+        if self.end < 0:
+            self.end = len(self.elements)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Array) and self.values() == other.values()
+
+    def length(self) -> int:
+        return self.end - self.start
+
+    def values(self) -> List[Object]:
+        if self.start == 0 and self.end == len(self.elements):
+            return self.elements
+        return self.elements[self.start : self.end]
 
     def object_type(self) -> ObjectType:
         return ARRAY_OBJ
 
     def inspect(self) -> str:
-        return f'[{", ".join([e.inspect() for e in self.elements])}]'
+        return f'[{", ".join([e.inspect() for e in self.values()])}]'
+
 
+class HashKey(NamedTuple):
+    type_tag: int
+    value: Any
 
-@dataclass
+
+@dataclass(slots=True)
 class Hash(Object):
-    pairs: Dict
+    pairs: Dict[HashKey, Object]
+
+    TAG = HASH_TAG
 
     def object_type(self) -> ObjectType:
         return HASH_OBJ
@@ -144,6 +227,84 @@ class Hash(Object):
         return "hello world"
 
 
+@dataclass(slots=True)
+class CompiledFunction(Object):
+    instructions: List[Tuple[int, Any]]
+    num_locals: int
+    num_params: int
+    literal: ast.FunctionLiteral
+
+    TAG = COMPILED_FUNCTION_TAG
+
+    def object_type(self) -> ObjectType:
+        return COMPILED_FUNCTION_OBJ
+
+    def inspect(self) -> str:
+        return f"CompiledFunction[{len(self.instructions)}]"
+
+
+@dataclass(slots=True, eq=False)
+class Closure(Object):
+    fn: CompiledFunction
+    free: List[Any]
+
+    TAG = FUNCTION_TAG
+
+    def object_type(self) -> ObjectType:
+        return FUNCTION_OBJ
+
+    def inspect(self) -> str:
+        params = ", ".join([str(s) for s in self.fn.literal.params])
+        return f"fn({params}){str(self.fn.literal.body)}"
+
+
 NULL = NullObject()
 TRUE = Boolean(True)
 FALSE = Boolean(False)
+
+# Hash keys carry a tag for the type of the key as well as its value so that
+# e.g. 1 and true don't collide
+HASH_KEY_TAGS: Dict[type, int] = {cls: cls.TAG for cls in (Integer, String, Boolean)}
+
+
+def hash_key(obj: Object) -> Optional[HashKey]:
+    tag = HASH_KEY_TAGS.get(type(obj))
+    if tag is None:
+        return None
+    return HashKey(tag, cast(Any, obj).value)
+
+
+# Objects are never mutated once created, so the most common small values
+# are shared rather than allocated each time they're produced
+_SMALL_INTS = tuple(Integer(i) for i in range(-5, 257))
+_SHORT_STRINGS: Dict[str, String] = {chr(i): String(chr(i)) for i in range(128)}
+_SHORT_STRINGS[""] = String("")
+
+
+def make_int(value: int) -> Integer:
+    if -5 <= value <= 256:
+        return _SMALL_INTS[value + 5]
+    return Integer(value)
+
+
+def make_str(value: str) -> String:
+    if len(value) <= 1:
+        string = _SHORT_STRINGS.get(value)
+        if string is not None:
+            return string
+    return String(value)
+
+
+# Function calls evaluate in a fresh dict, names it doesn't bind are resolved in
+# the environment the function was defined in. That's stored under a key which
+# can't be spelled as an identifier so it never collides with a binding.
+PARENT = "<parent>"
+
+
+def lookup(env: Optional[Dict], name: str) -> Optional[Object]:
+    while env is not None:
+        val = env.get(name)
+        if val is not None:
+            return val
+        env = env.get(PARENT)
+    return None
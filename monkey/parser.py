@@ -1,8 +1,6 @@
-from enum import Enum, auto
-from typing import Callable, List, Dict, Optional
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
 
 import monkey.token as token
-from monkey.lexer import Lexer
 import monkey.ast as ast
 
 
@@ -11,92 +9,123 @@ class ParseException(Exception):
 
 
 class NoPrefixParseMethodException(ParseException):
-    def __init__(self, expression):
-        self.expression = expression
+    def __init__(self, tok_type: token.TokenType) -> None:
+        super().__init__(tok_type)
+        self.tok_type = tok_type
 
+    def __str__(self) -> str:
+        return f'no prefix parse function for "{self.tok_type}" found'
 
-prefixParseFn = Callable[[], ast.Node]
-infixParseFn = Callable[[ast.Node], ast.Node]
 
+prefixParseFn = Callable[["Parser"], ast.Node]
+infixParseFn = Callable[["Parser", ast.Node], ast.Node]
 
-class OperatorPrecedence(Enum):
-    LOWEST = auto()
-    EQUALS = auto()
-    LESSGREATER = auto()
-    SUM = auto()
-    PRODUCT = auto()
-    PREFIX = auto()
-    CALL = auto()
-    INDEX = auto()
+
+# Operator precedences, lowest to highest. Plain ints rather than an Enum as
+# they're compared for every token in the expression loop.
+LOWEST, EQUALS, LESSGREATER, SUM, PRODUCT, PREFIX, CALL, INDEX = range(1, 9)
 
 
 precedences = {
-    token.EQ: OperatorPrecedence.EQUALS,
-    token.NOT_EQ: OperatorPrecedence.EQUALS,
-    token.LT: OperatorPrecedence.LESSGREATER,
-    token.GT: OperatorPrecedence.LESSGREATER,
-    token.PLUS: OperatorPrecedence.SUM,
-    token.MINUS: OperatorPrecedence.SUM,
-    token.SLASH: OperatorPrecedence.PRODUCT,
-    token.ASTERISK: OperatorPrecedence.PRODUCT,
-    token.LPAREN: OperatorPrecedence.CALL,
-    token.LBRACKET: OperatorPrecedence.INDEX,
+    token.EQ: EQUALS,
+    token.NOT_EQ: EQUALS,
+    token.LT: LESSGREATER,
+    token.GT: LESSGREATER,
+    token.PLUS: SUM,
+    token.MINUS: SUM,
+    token.SLASH: PRODUCT,
+    token.ASTERISK: PRODUCT,
+    token.LPAREN: CALL,
+    token.LBRACKET: INDEX,
 }
 
+# Literal nodes are never mutated after parsing, so every occurrence of the same
+# literal can be represented by one node
+TRUE_NODE = ast.Boolean(token.Token(token.TRUE, "true"), True)
+FALSE_NODE = ast.Boolean(token.Token(token.FALSE, "false"), False)
 
-class Parser:
+_EOF_TOKEN = token.Token(token.EOF, "")
 
-    prefix_parse_fns: Dict[token.TokenType, prefixParseFn]
-    infix_parse_fns: Dict[token.TokenType, infixParseFn]
+_LITERAL_NODES = frozenset({ast.IntegerLiteral, ast.StringLiteral, ast.Boolean})
 
-    def __init__(self, lexer: Lexer) -> None:
-        self.lexer = lexer
-        self.cur_token: token.Token = None
-        self.peek_token: token.Token = None
-        self.next_token()
-        self.next_token()
-        self.errors: List[str] = []
-        self.prefix_parse_fns = {
-            token.LBRACE: self.parse_hash_literal,
-            token.STRING: self.parse_string_literal,
-            token.IDENT: self.parse_identifier,
-            token.INT: self.parse_integer_literal,
-            token.BANG: self.parse_prefix_expression,
-            token.MINUS: self.parse_prefix_expression,
-            token.TRUE: self.parse_boolean,
-            token.FALSE: self.parse_boolean,
-            token.LPAREN: self.parse_group_expression,
-            token.IF: self.parse_if_expression,
-            token.FUNCTION: self.parse_function_literal,
-            token.LBRACKET: self.parse_array_literal,
-        }
-        self.infix_parse_fns = {
-            token.PLUS: self.parse_infix_expression,
-            token.MINUS: self.parse_infix_expression,
-            token.SLASH: self.parse_infix_expression,
-            token.ASTERISK: self.parse_infix_expression,
-            token.EQ: self.parse_infix_expression,
-            token.NOT_EQ: self.parse_infix_expression,
-            token.LT: self.parse_infix_expression,
-            token.GT: self.parse_infix_expression,
-            token.LPAREN: self.parse_call_expression,
-            token.LBRACKET: self.parse_index_expression,
-        }
+# Values of short integer literals, looked up rather than going through int()
+_SMALL_INT_VALUES = {str(i): i for i in range(1000)}
 
-    def next_token(self) -> None:
-        self.cur_token = self.peek_token
-        self.peek_token = self.lexer.next_token()
 
-    def peek_error(self, t):
-        self.errors.append(
-            f'expected next token to be "{t}" got "{self.peek_token.tok_type}" instead'
-        )
+# Accepts a Lexer or an already tokenized list, either way the whole token
+# stream is materialized up front. It always ends in EOF, added if a list
+# doesn't, which is repeated once more so there's always a token to peek at.
+def _token_stream(tokens: Iterable[token.Token]) -> List[token.Token]:
+    stream = list(tokens)
+    if not stream or stream[-1].tok_type is not token.EOF:
+        stream.append(_EOF_TOKEN)
+    stream.append(stream[-1])
+    return stream
+
+
+class Parser:
+    def __init__(self, lexer: Iterable[token.Token], memoize: bool = False) -> None:
+        # Packrat style memo of parsed expressions, keyed by start position and
+        # precedence, holding the node and the position parsing ended at. The
+        # grammar never backtracks so it's opt in.
+        self.memoize = memoize
+        self.reset(lexer)
+
+    # Parse a token list built by hand rather than by the Lexer, it doesn't
+    # need to end in EOF
+    @classmethod
+    def from_tokens(
+        cls, tokens: Iterable[token.Token], memoize: bool = False
+    ) -> "Parser":
+        return cls(tokens, memoize)
+
+    # Start over on a new token stream, a parser can be reused for any number
+    # of sources
+    def reset(self, lexer: Iterable[token.Token]) -> None:
+        self.tokens: List[token.Token] = _token_stream(lexer)
+        self.pos = 0
+        # Position of the final EOF, the parser never advances past it
+        self._last = len(self.tokens) - 2
+        self.cur_token: token.Token = self.tokens[0]
+        self.peek_token: token.Token = self.tokens[1]
+        # Errors are kept as (expected, got) token types, see errors_formatted
+        self.errors: List[Tuple[token.TokenType, token.TokenType]] = []
+        self._memo: Dict[Tuple[int, int], Tuple[ast.Node, int]] = {}
+        # Repeated integer literals share a node, see TRUE_NODE
+        self._int_literals: Dict[str, ast.IntegerLiteral] = {}
+        # Other nodes built only from literals are hash-consed, so identical
+        # subtrees are one object
+        self._nodes: Dict[Tuple, ast.Node] = {}
+
+    def next_token(self) -> None:
+        pos = self.pos
+        if pos < self._last:
+            pos += 1
+            self.pos = pos
+        tokens = self.tokens
+        self.cur_token = tokens[pos]
+        self.peek_token = tokens[pos + 1]
+
+    def seek(self, pos: int) -> None:
+        self.pos = pos
+        self.cur_token = self.tokens[pos]
+        self.peek_token = self.tokens[pos + 1]
+
+    def peek_error(self, t: token.TokenType) -> None:
+        self.errors.append((t, self.peek_token.tok_type))
+
+    @property
+    def errors_formatted(self) -> List[str]:
+        return [
+            f'expected next token to be "{expected}" got "{got}" instead'
+            for expected, got in self.errors
+        ]
 
     def cur_token_is(self, t: token.TokenType) -> bool:
-        return self.cur_token.tok_type == t
+        return self.cur_token.tok_type is t
 
     def peek_token_is(self, t: token.TokenType) -> bool:
-        return self.peek_token.tok_type == t
+        return self.peek_token.tok_type is t
 
     def expect_peek(self, t: token.TokenType) -> bool:
         if self.peek_token_is(t):
@@ -108,6 +137,7 @@ class Parser:
 
     def parse_program(self) -> ast.Node:
         program = ast.Program()
+        append = program.statements.append
 
         # Continue until EOF
         while not self.cur_token_is(token.EOF):
@@ -115,7 +145,7 @@ class Parser:
             # Try and parse a statement
             stmt = self.parse_statement()
             if stmt is not None:
-                program.statements.append(stmt)
+                append(stmt)
 
             # Advance the parser
             self.next_token()
@@ -124,12 +154,10 @@ class Parser:
         return program
 
     def parse_statement(self) -> Optional[ast.Node]:
-        if self.cur_token.tok_type == token.LET:
-            return self.parse_let_statement()
-        elif self.cur_token.tok_type == token.RETURN:
-            return self.parse_return_statement()
-        else:
-            return self.parse_expression_statement()
+        parse_fn = _STATEMENT_PARSE_FNS.get(
+            self.cur_token.tok_type, Parser.parse_expression_statement
+        )
+        return parse_fn(self)
 
     def parse_let_statement(self) -> Optional[ast.LetStatement]:
         stmt_token = self.cur_token
@@ -137,78 +165,125 @@ class Parser:
         if not self.expect_peek(token.IDENT):
             return None
 
-        name = ast.Identifier(token=self.cur_token, value=self.cur_token.literal)
+        name = ast.Identifier(self.cur_token, self.cur_token.literal)
 
         if not self.expect_peek(token.ASSIGN):
             return None
 
         self.next_token()
 
-        value = self.parse_expression(OperatorPrecedence.LOWEST)
+        value = self.parse_expression(LOWEST)
 
         if self.peek_token_is(token.SEMICOLON):
             self.next_token()
 
-        return ast.LetStatement(token=stmt_token, name=name, value=value)
+        return ast.LetStatement(stmt_token, name, value)
 
     def parse_return_statement(self):
         stmt_token = self.cur_token
 
         self.next_token()
-        return_value = self.parse_expression(OperatorPrecedence.LOWEST)
+        return_value = self.parse_expression(LOWEST)
 
         if self.peek_token_is(token.SEMICOLON):
             self.next_token()
 
-        return ast.ReturnStatement(token=stmt_token, value=return_value)
+        return ast.ReturnStatement(stmt_token, return_value)
 
     def parse_expression_statement(self):
         stmt_token = self.cur_token
-        expression = self.parse_expression(OperatorPrecedence.LOWEST)
+        expression = self.parse_expression(LOWEST)
 
         if self.peek_token_is(token.SEMICOLON):
             self.next_token()
 
-        return ast.ExpressionStatement(token=stmt_token, expression=expression)
-
-    def parse_expression(self, precedence: OperatorPrecedence) -> ast.Node:
-        prefix_fn = self.prefix_parse_fns.get(self.cur_token.tok_type)
-        if prefix_fn is None:
-            raise NoPrefixParseMethodException(
-                f'no prefix parse function for "{self.cur_token.tok_type}" found'
-            )
-        left_exp = prefix_fn()
-
-        while (
-            not self.peek_token_is(token.SEMICOLON)
-            and precedence.value < self.peek_precedence().value
-        ):
-            infix = self.infix_parse_fns.get(self.peek_token.tok_type)
+        return ast.ExpressionStatement(stmt_token, expression)
+
+    def parse_expression(self, precedence: int) -> ast.Node:
+        # Results aren't memoized once there are errors, so that re-parsing
+        # reports them at the same positions
+        if not self.memoize or self.errors:
+            return self._parse_expression(precedence)
+        key = (self.pos, precedence)
+        memoized = self._memo.get(key)
+        if memoized is not None:
+            node, end = memoized
+            self.seek(end)
+            return node
+        node = self._parse_expression(precedence)
+        if not self.errors:
+            self._memo[key] = (node, self.pos)
+        return node
+
+    def _parse_expression(self, precedence: int) -> ast.Node:
+        # Leaves make up most of an expression tree, build them here rather
+        # than calling their parse functions
+        cur_token = self.cur_token
+        tok_type = cur_token.tok_type
+        left_exp: ast.Node
+        if tok_type is token.IDENT:
+            left_exp = ast.Identifier(cur_token, cur_token.literal)
+        elif tok_type is token.INT:
+            literal = self._int_literals.get(cur_token.literal)
+            if literal is None:
+                left_exp = self.parse_integer_literal()
+            else:
+                left_exp = literal
+        elif tok_type is token.TRUE:
+            left_exp = TRUE_NODE
+        elif tok_type is token.FALSE:
+            left_exp = FALSE_NODE
+        else:
+            prefix_fn = _PREFIX_PARSE_FNS.get(tok_type)
+            if prefix_fn is None:
+                raise NoPrefixParseMethodException(tok_type)
+            left_exp = prefix_fn(self)
+
+        # Everything the loop touches is bound to a local up front
+        infix_parse_fns = _INFIX_PARSE_FNS
+        get_precedence = precedences.get
+        semicolon = token.SEMICOLON
+        while True:
+            peek_type = self.peek_token.tok_type
+            if peek_type is semicolon or precedence >= get_precedence(
+                peek_type, LOWEST
+            ):
+                return left_exp
+            infix = infix_parse_fns.get(peek_type)
             if infix is None:
                 return left_exp
             self.next_token()
-            left_exp = infix(left_exp)
-
-        return left_exp
+            left_exp = infix(self, left_exp)
 
     def parse_string_literal(self) -> ast.Node:
-        return ast.StringLiteral(token=self.cur_token, value=self.cur_token.literal)
+        literal = self.cur_token.literal
+        key = (ast.StringLiteral, literal)
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = ast.StringLiteral(self.cur_token, literal)
+        return node
 
     def parse_identifier(self) -> ast.Node:
-        return ast.Identifier(token=self.cur_token, value=self.cur_token.literal)
+        return ast.Identifier(self.cur_token, self.cur_token.literal)
 
     def parse_integer_literal(self) -> ast.Node:
-        return ast.IntegerLiteral(
-            token=self.cur_token, value=int(self.cur_token.literal)
-        )
+        literal = self.cur_token.literal
+        node = self._int_literals.get(literal)
+        if node is None:
+            value = _SMALL_INT_VALUES.get(literal)
+            if value is None:
+                value = int(literal)
+            node = ast.IntegerLiteral(self.cur_token, value)
+            self._int_literals[literal] = node
+        return node
 
     def parse_boolean(self) -> ast.Node:
-        return ast.Boolean(token=self.cur_token, value=self.cur_token_is(token.TRUE))
+        return TRUE_NODE if self.cur_token.tok_type is token.TRUE else FALSE_NODE
 
     def parse_group_expression(self) -> ast.Node:
         self.next_token()
 
-        exp = self.parse_expression(OperatorPrecedence.LOWEST)
+        exp = self.parse_expression(LOWEST)
 
         if not self.expect_peek(token.RPAREN):
             return None
@@ -222,7 +297,7 @@ class Parser:
             return None
 
         self.next_token()
-        condition = self.parse_expression(OperatorPrecedence.LOWEST)
+        condition = self.parse_expression(LOWEST)
 
         if not self.expect_peek(token.RPAREN):
             return None
@@ -242,12 +317,7 @@ class Parser:
 
             alternative = self.parse_block_statement()
 
-        return ast.IfExpression(
-            token=expression_token,
-            condition=condition,
-            consequence=consequence,
-            alternative=alternative,
-        )
+        return ast.IfExpression(expression_token, condition, consequence, alternative)
 
     def parse_function_literal(self) -> ast.FunctionLiteral:
         tok = self.cur_token
@@ -262,13 +332,11 @@ class Parser:
 
         body = self.parse_block_statement()
 
-        return ast.FunctionLiteral(token=tok, params=params, body=body)
+        return ast.FunctionLiteral(tok, params, body)
 
     def parse_array_literal(self) -> ast.ArrayLiteral:
         tok = self.cur_token
-        return ast.ArrayLiteral(
-            token=tok, elements=self.parse_expression_list(token.RBRACKET)
-        )
+        return ast.ArrayLiteral(tok, self.parse_expression_list(token.RBRACKET))
 
     def parse_expression_list(self, end: token.TokenType) -> List[ast.Node]:
         if self.peek_token_is(end):
@@ -276,12 +344,12 @@ class Parser:
             return []
 
         self.next_token()
-        expressions = [self.parse_expression(OperatorPrecedence.LOWEST)]
+        expressions = [self.parse_expression(LOWEST)]
 
         while self.peek_token_is(token.COMMA):
             self.next_token()
             self.next_token()
-            expressions.append(self.parse_expression(OperatorPrecedence.LOWEST))
+            expressions.append(self.parse_expression(LOWEST))
 
         if not self.expect_peek(end):
             return []
@@ -295,16 +363,17 @@ class Parser:
             self.next_token()
             return identifiers
 
-        self.next_token()
-
-        ident = ast.Identifier(token=self.cur_token, value=self.cur_token.literal)
-        identifiers.append(ident)
-
-        while self.peek_token_is(token.COMMA):
-            self.next_token()
-            self.next_token()
-            ident = ast.Identifier(token=self.cur_token, value=self.cur_token.literal)
-            identifiers.append(ident)
+        # Parameters are single tokens separated by commas, so they're read
+        # straight out of the token list rather than advancing one at a time
+        tokens = self.tokens
+        pos = self.pos + 1
+        while True:
+            tok = tokens[pos]
+            identifiers.append(ast.Identifier(tok, tok.literal))
+            if tokens[pos + 1].tok_type is not token.COMMA:
+                break
+            pos += 2
+        self.seek(pos)
 
         if not self.expect_peek(token.RPAREN):
             return None
@@ -312,68 +381,76 @@ class Parser:
         return identifiers
 
     def parse_block_statement(self) -> ast.BlockStatement:
-        block = ast.BlockStatement(token=self.cur_token, statements=[])
+        block = ast.BlockStatement(self.cur_token, [])
+        append = block.statements.append
 
         self.next_token()
 
         while not self.cur_token_is(token.RBRACE) and not self.cur_token_is(token.EOF):
             stmt = self.parse_statement()
             if stmt is not None:
-                block.statements.append(stmt)
+                append(stmt)
             self.next_token()
 
         return block
 
     def parse_prefix_expression(self) -> ast.Node:
-        expression = ast.PrefixExpression(
-            token=self.cur_token, operator=self.cur_token.literal, right=None
-        )
+        expression = ast.PrefixExpression(self.cur_token, self.cur_token.literal, None)
         self.next_token()
-        expression.right = self.parse_expression(OperatorPrecedence.PREFIX)
+        expression.right = self.parse_expression(PREFIX)
         return expression
 
     def parse_infix_expression(self, left: ast.Node) -> ast.Node:
-        expression = ast.InfixExpression(
-            token=self.cur_token, operator=self.cur_token.literal, left=left, right=None
-        )
-        precedence = self.cur_precedence()
+        cur_token = self.cur_token
+        expression = ast.InfixExpression(cur_token, left, cur_token.literal, None)
+        # Only reached for tokens with an infix precedence
+        precedence = precedences[cur_token.tok_type]
         self.next_token()
-        expression.right = self.parse_expression(precedence)
+        right = expression.right = self.parse_expression(precedence)
+        # Literal operands are already shared, so their identities say whether
+        # an identical expression has been built before. Like the memo, sharing
+        # stops once there are errors since the tree may be incomplete
+        if (
+            not self.errors
+            and type(left) in _LITERAL_NODES
+            and type(right) in _LITERAL_NODES
+        ):
+            key = (ast.InfixExpression, id(left), expression.operator, id(right))
+            return self._nodes.setdefault(key, expression)
         return expression
 
     def parse_index_expression(self, left: ast.Node) -> ast.Node:
         cur_token = self.cur_token
         self.next_token()
-        index = self.parse_expression(OperatorPrecedence.LOWEST)
+        index = self.parse_expression(LOWEST)
         if not self.expect_peek(token.RBRACKET):
             return None
-        return ast.IndexExpression(token=cur_token, left=left, index=index)
+        return ast.IndexExpression(cur_token, left, index)
 
     def parse_call_expression(self, left: ast.Node) -> ast.Node:
         cur_token = self.cur_token
         return ast.CallExpression(
-            token=cur_token,
-            function=left,
-            arguments=self.parse_expression_list(token.RPAREN),
+            cur_token, left, self.parse_expression_list(token.RPAREN)
         )
 
-    def peek_precedence(self) -> OperatorPrecedence:
-        return precedences.get(self.peek_token.tok_type, OperatorPrecedence.LOWEST)
+    def peek_precedence(self) -> int:
+        return precedences.get(self.peek_token.tok_type, LOWEST)
 
-    def cur_precedence(self) -> OperatorPrecedence:
-        return precedences.get(self.cur_token.tok_type, OperatorPrecedence.LOWEST)
+    def cur_precedence(self) -> int:
+        return precedences.get(self.cur_token.tok_type, LOWEST)
 
     def parse_hash_literal(self) -> ast.Node:
-        hash_literal = ast.HashLiteral(token=self.cur_token, pairs={})
+        hash_literal = ast.HashLiteral(self.cur_token, [])
+        append = hash_literal.pairs.append
 
         while not self.peek_token_is(token.RBRACE):
             self.next_token()
-            key = self.parse_expression(OperatorPrecedence.LOWEST)
+            key = self.parse_expression(LOWEST)
             if not self.expect_peek(token.COLON):
                 return None
             self.next_token()
-            value = self.parse_expression(OperatorPrecedence.LOWEST)
-            hash_literal.pairs[key] = value
+            value = self.parse_expression(LOWEST)
+            append((key, value))
 
             if not self.peek_token_is(token.RBRACE) and not self.expect_peek(
                 token.COMMA
@@ -384,3 +461,40 @@ class Parser:
             return None
 
         return hash_literal
+
+
+# Parse functions are looked up by token type and called with the parser, the
+# tables are shared by every instance rather than built from bound methods.
+# Anything that isn't a let or return is an expression statement.
+_STATEMENT_PARSE_FNS: Dict[token.TokenType, Callable[[Parser], Optional[ast.Node]]] = {
+    token.LET: Parser.parse_let_statement,
+    token.RETURN: Parser.parse_return_statement,
+}
+
+_PREFIX_PARSE_FNS: Dict[token.TokenType, prefixParseFn] = {
+    token.LBRACE: Parser.parse_hash_literal,
+    token.STRING: Parser.parse_string_literal,
+    token.IDENT: Parser.parse_identifier,
+    token.INT: Parser.parse_integer_literal,
+    token.BANG: Parser.parse_prefix_expression,
+    token.MINUS: Parser.parse_prefix_expression,
+    token.TRUE: Parser.parse_boolean,
+    token.FALSE: Parser.parse_boolean,
+    token.LPAREN: Parser.parse_group_expression,
+    token.IF: Parser.parse_if_expression,
+    token.FUNCTION: Parser.parse_function_literal,
+    token.LBRACKET: Parser.parse_array_literal,
+}
+
+_INFIX_PARSE_FNS: Dict[token.TokenType, infixParseFn] = {
+    token.PLUS: Parser.parse_infix_expression,
+    token.MINUS: Parser.parse_infix_expression,
+    token.SLASH: Parser.parse_infix_expression,
+    token.ASTERISK: Parser.parse_infix_expression,
+    token.EQ: Parser.parse_infix_expression,
+    token.NOT_EQ: Parser.parse_infix_expression,
+    token.LT: Parser.parse_infix_expression,
+    token.GT: Parser.parse_infix_expression,
+    token.LPAREN: Parser.parse_call_expression,
+    token.LBRACKET: Parser.parse_index_expression,
+}
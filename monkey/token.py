@@ -1,46 +1,48 @@
+import sys
 from typing import Dict, NamedTuple
 
 TokenType = str
 
-ILLEGAL: TokenType = "ILLEGAL"
-EOF: TokenType = "EOF"
+# Token types are interned so the parser can compare them by identity
+ILLEGAL: TokenType = sys.intern("ILLEGAL")
+EOF: TokenType = sys.intern("EOF")
 
-IDENT: TokenType = "IDENT"
-INT: TokenType = "INT"
+IDENT: TokenType = sys.intern("IDENT")
+INT: TokenType = sys.intern("INT")
 
 
-ASSIGN: TokenType = "="
-PLUS: TokenType = "+"
-MINUS: TokenType = "-"
-BANG: TokenType = "!"
-ASTERISK: TokenType = "*"
-SLASH: TokenType = "/"
+ASSIGN: TokenType = sys.intern("=")
+PLUS: TokenType = sys.intern("+")
+MINUS: TokenType = sys.intern("-")
+BANG: TokenType = sys.intern("!")
+ASTERISK: TokenType = sys.intern("*")
+SLASH: TokenType = sys.intern("/")
 
-COLON = ":"
+COLON: TokenType = sys.intern(":")
 
-LT: TokenType = "<"
-GT: TokenType = ">"
+LT: TokenType = sys.intern("<")
+GT: TokenType = sys.intern(">")
 
-EQ: TokenType = "=="
-NOT_EQ: TokenType = "!="
+EQ: TokenType = sys.intern("==")
+NOT_EQ: TokenType = sys.intern("!=")
 
-COMMA: TokenType = ","
-SEMICOLON: TokenType = ";"
-LPAREN: TokenType = "("
-RPAREN: TokenType = ")"
-LBRACE: TokenType = "{"
-RBRACE: TokenType = "}"
-LBRACKET = "["
-RBRACKET = "]"
+COMMA: TokenType = sys.intern(",")
+SEMICOLON: TokenType = sys.intern(";")
+LPAREN: TokenType = sys.intern("(")
+RPAREN: TokenType = sys.intern(")")
+LBRACE: TokenType = sys.intern("{")
+RBRACE: TokenType = sys.intern("}")
+LBRACKET: TokenType = sys.intern("[")
+RBRACKET: TokenType = sys.intern("]")
 
-FUNCTION: TokenType = "FUNCTION"
-LET: TokenType = "LET"
-TRUE: TokenType = "TRUE"
-FALSE: TokenType = "FALSE"
-IF: TokenType = "IF"
-ELSE: TokenType = "ELSE"
-STRING = "STRING"
-RETURN: TokenType = "RETURN"
+FUNCTION: TokenType = sys.intern("FUNCTION")
+LET: TokenType = sys.intern("LET")
+TRUE: TokenType = sys.intern("TRUE")
+FALSE: TokenType = sys.intern("FALSE")
+IF: TokenType = sys.intern("IF")
+ELSE: TokenType = sys.intern("ELSE")
+STRING: TokenType = sys.intern("STRING")
+RETURN: TokenType = sys.intern("RETURN")
 
 
 class Token(NamedTuple):
@@ -77,4 +79,13 @@ token_table: Dict[str, TokenType] = {
     ")": RPAREN,
     "{": LBRACE,
     "}": RBRACE,
+    "[": LBRACKET,
+    "]": RBRACKET,
+    ":": COLON,
+    "==": EQ,
+    "!=": NOT_EQ,
 }
+
+assert all(
+    sys.intern(t) is t for t in (*keywords.values(), *token_table.values())
+), "token types must be interned"
@@ -0,0 +1,140 @@
+from typing import Any, Callable, Iterator, Optional
+
+import monkey.ast as ast
+import monkey.token as token
+
+
+def _walk(node: Any, rewrite: Callable[[ast.Node], ast.Node]) -> Any:
+    # Children are rewritten in place before their parent, which is replaced by
+    # whatever `rewrite` returns for it
+    if isinstance(node, list):
+        return [_walk(n, rewrite) for n in node]
+    elif isinstance(node, tuple):
+        return tuple([_walk(n, rewrite) for n in node])
+    elif not isinstance(node, ast.Node):
+        return node
+
+    for name in ast.child_fields(node):
+        setattr(node, name, _walk(getattr(node, name), rewrite))
+    # A string cached before rewriting may no longer describe the node
+    if hasattr(node, "_str_cache"):
+        node._str_cache = None
+    return rewrite(node)
+
+
+# Replace operations on literal operands with the literal they produce, the
+# program is folded in place and the (possibly replaced) root is returned
+def fold_constants(node: Any) -> Any:
+    return _walk(node, _fold_node)
+
+
+def _fold_node(node: ast.Node) -> ast.Node:
+    if isinstance(node, ast.InfixExpression):
+        folded = _fold_infix(node)
+    elif isinstance(node, ast.PrefixExpression):
+        folded = _fold_prefix(node)
+    else:
+        folded = None
+    return node if folded is None else folded
+
+
+# Fuse common shapes into nodes that are cheaper to evaluate, run after
+# fold_constants so literal operands are already folded
+def peephole(node: Any) -> Any:
+    return _walk(node, _peephole_node)
+
+
+def _peephole_node(node: ast.Node) -> ast.Node:
+    if (
+        isinstance(node, ast.InfixExpression)
+        and node.operator in ("+", "-")
+        and isinstance(node.right, ast.IntegerLiteral)
+    ):
+        constant = node.right.value if node.operator == "+" else -node.right.value
+        return ast.AddK(node.token, node.left, node.operator, node.right, constant)
+    elif isinstance(node, ast.FunctionLiteral):
+        _fuse_let_return(node)
+    return node
+
+
+def _fuse_let_return(fn: ast.FunctionLiteral) -> None:
+    # `let x = v; return x;` becomes `return v;` when nothing else in the
+    # function refers to x, a closure could otherwise still read the binding.
+    # Only done inside functions, at the top level the let binds a global.
+    blocks = [n for n in _nodes(fn.body) if isinstance(n, ast.BlockStatement)]
+    for block in blocks:
+        stmts = block.statements
+        for i in range(len(stmts) - 2, -1, -1):
+            let, ret = stmts[i], stmts[i + 1]
+            if (
+                isinstance(let, ast.LetStatement)
+                and isinstance(ret, ast.ReturnStatement)
+                and isinstance(ret.value, ast.Identifier)
+                and ret.value.value == let.name.value
+                and _uses(fn.body, let.name.value) == 2
+            ):
+                stmts[i : i + 2] = [ast.ReturnStatement(ret.token, let.value)]
+                block._str_cache = None
+
+
+def _uses(node: ast.Node, name: str) -> int:
+    return sum(1 for i in ast.identifiers(node) if i.value == name)
+
+
+def _nodes(node: Any) -> Iterator[ast.Node]:
+    if isinstance(node, (list, tuple)):
+        for n in node:
+            yield from _nodes(n)
+    elif isinstance(node, ast.Node):
+        yield node
+        for name in ast.child_fields(node):
+            yield from _nodes(getattr(node, name))
+
+
+def _integer_literal(value: int) -> ast.IntegerLiteral:
+    return ast.IntegerLiteral(token=token.Token(token.INT, str(value)), value=value)
+
+
+def _boolean(value: bool) -> ast.Boolean:
+    if value:
+        return ast.Boolean(token=token.Token(token.TRUE, "true"), value=True)
+    return ast.Boolean(token=token.Token(token.FALSE, "false"), value=False)
+
+
+def _fold_prefix(node: ast.PrefixExpression) -> Optional[ast.Node]:
+    if node.operator == "-" and isinstance(node.right, ast.IntegerLiteral):
+        return _integer_literal(-node.right.value)
+    return None
+
+
+def _fold_infix(node: ast.InfixExpression) -> Optional[ast.Node]:
+    left, right, operator = node.left, node.right, node.operator
+
+    if isinstance(left, ast.IntegerLiteral) and isinstance(right, ast.IntegerLiteral):
+        lhs, rhs = left.value, right.value
+        if operator == "+":
+            return _integer_literal(lhs + rhs)
+        elif operator == "-":
+            return _integer_literal(lhs - rhs)
+        elif operator == "*":
+            return _integer_literal(lhs * rhs)
+        elif operator == "/" and rhs != 0:
+            return _integer_literal(lhs // rhs)
+        elif operator == "<":
+            return _boolean(lhs < rhs)
+        elif operator == ">":
+            return _boolean(lhs > rhs)
+        elif operator == "==":
+            return _boolean(lhs == rhs)
+        elif operator == "!=":
+            return _boolean(lhs != rhs)
+
+    elif (
+        isinstance(left, ast.StringLiteral)
+        and isinstance(right, ast.StringLiteral)
+        and operator == "+"
+    ):
+        value = left.value + right.value
+        return ast.StringLiteral(token=token.Token(token.STRING, value), value=value)
+
+    return None
@@ -0,0 +1,295 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import monkey.object as monkey_obj
+from monkey.builtins import builtin_fns, builtin_names
+from monkey.compiler import (
+    Instruction,
+    OP_ADD,
+    OP_ARRAY,
+    OP_BANG,
+    OP_CALL,
+    OP_CLOSURE,
+    OP_CONST,
+    OP_CURRENT_CLOSURE,
+    OP_DIV,
+    OP_EQ,
+    OP_GET_BUILTIN,
+    OP_GET_FREE,
+    OP_GET_GLOBAL,
+    OP_GET_LOCAL,
+    OP_GT,
+    OP_HASH,
+    OP_INDEX,
+    OP_JMP,
+    OP_JMP_IF_FALSE,
+    OP_LT,
+    OP_MINUS,
+    OP_MUL,
+    OP_NOT_EQ,
+    OP_POP,
+    OP_RETURN,
+    OP_SET_GLOBAL,
+    OP_SET_LOCAL,
+    OP_SUB,
+)
+
+# The VM works on plain Python values for int, bool, str and None (null).
+# Arrays, hashes, closures and builtins are kept as monkey objects, so passing
+# them to builtins doesn't copy them and rest() shares its argument's storage.
+# Array elements and hash values are stored boxed and unboxed as they're read.
+
+_MISSING = object()
+
+# Hashes are keyed the same way as monkey_obj.Hash so boxing doesn't rehash
+_hash_key_tags = {
+    int: monkey_obj.HASH_KEY_TAGS[monkey_obj.Integer],
+    str: monkey_obj.HASH_KEY_TAGS[monkey_obj.String],
+    bool: monkey_obj.HASH_KEY_TAGS[monkey_obj.Boolean],
+}
+
+
+class VMError(Exception):
+    def __init__(self, msg: str) -> None:
+        self.msg = msg
+
+
+def box(value: Any) -> monkey_obj.Object:
+    value_type = type(value)
+    if value_type is bool:
+        return monkey_obj.TRUE if value else monkey_obj.FALSE
+    elif value_type is int:
+        return monkey_obj.make_int(value)
+    elif value_type is str:
+        return monkey_obj.make_str(value)
+    elif value is None:
+        return monkey_obj.NULL
+    return value
+
+
+def unbox(obj: monkey_obj.Object) -> Any:
+    if isinstance(obj, (monkey_obj.Integer, monkey_obj.Boolean, monkey_obj.String)):
+        return obj.value
+    elif obj is monkey_obj.NULL:
+        return None
+    elif isinstance(obj, monkey_obj.Error):
+        raise VMError(obj.msg)
+    return obj
+
+
+def type_name(value: Any) -> str:
+    return box(value).object_type()
+
+
+def binary_op(op: int, lhs: Any, rhs: Any) -> Any:
+    if type(lhs) is int and type(rhs) is int:
+        if op == OP_ADD:
+            return lhs + rhs
+        elif op == OP_SUB:
+            return lhs - rhs
+        elif op == OP_MUL:
+            return lhs * rhs
+        elif op == OP_DIV:
+            return lhs // rhs
+        elif op == OP_LT:
+            return lhs < rhs
+        elif op == OP_GT:
+            return lhs > rhs
+        elif op == OP_EQ:
+            return lhs == rhs
+        else:
+            return lhs != rhs
+
+    operator = _operators[op]
+    if type(lhs) is not type(rhs):
+        raise VMError(f"type mismatch: {type_name(lhs)} {operator} {type_name(rhs)}")
+    elif type(lhs) is str and op == OP_ADD:
+        return lhs + rhs
+    elif type(lhs) is not str and op == OP_EQ:
+        return lhs == rhs
+    elif type(lhs) is not str and op == OP_NOT_EQ:
+        return lhs != rhs
+    raise VMError(f"unknown operator: {type_name(lhs)} {operator} {type_name(rhs)}")
+
+
+def index_op(left: Any, index: Any) -> Any:
+    if type(left) is monkey_obj.Array and type(index) is int:
+        if index < 0 or index >= left.length():
+            return None
+        return unbox(left.elements[left.start + index])
+    elif type(left) is monkey_obj.Hash:
+        tag = _hash_key_tags.get(type(index))
+        if tag is None:
+            raise VMError(f"unusable as hash key: {type_name(index)}")
+        return unbox(left.pairs.get(monkey_obj.HashKey(tag, index), monkey_obj.NULL))
+    raise VMError(f"index operator not supported: {type_name(left)}")
+
+
+def build_hash(items: List[Any]) -> monkey_obj.Hash:
+    pairs = {}
+    for i in range(0, len(items), 2):
+        key = items[i]
+        tag = _hash_key_tags.get(type(key))
+        if tag is None:
+            raise VMError(f"unusable as hash key: {type_name(key)}")
+        pairs[monkey_obj.HashKey(tag, key)] = box(items[i + 1])
+    return monkey_obj.Hash(pairs=pairs)
+
+
+def execute(code: List[Instruction], env: Dict[str, Any]) -> Any:
+    stack: List[Any] = []
+    push = stack.append
+    pop = stack.pop
+    # Caller state saved on each call: code, ip, bp and closure
+    frames: List[Tuple[List[Instruction], int, int, Optional[monkey_obj.Closure]]] = []
+    closure: Optional[monkey_obj.Closure] = None
+    bp = 0
+    ip = 0
+
+    while True:
+        op, arg = code[ip]
+        ip += 1
+
+        if op == OP_GET_LOCAL:
+            push(stack[bp + arg])
+        elif op == OP_CONST:
+            push(arg)
+        elif op == OP_ADD:
+            rhs = pop()
+            lhs = stack[-1]
+            if type(lhs) is int and type(rhs) is int:
+                stack[-1] = lhs + rhs
+            else:
+                stack[-1] = binary_op(op, lhs, rhs)
+        elif op == OP_SUB:
+            rhs = pop()
+            lhs = stack[-1]
+            if type(lhs) is int and type(rhs) is int:
+                stack[-1] = lhs - rhs
+            else:
+                stack[-1] = binary_op(op, lhs, rhs)
+        elif op == OP_LT:
+            rhs = pop()
+            lhs = stack[-1]
+            if type(lhs) is int and type(rhs) is int:
+                stack[-1] = lhs < rhs
+            else:
+                stack[-1] = binary_op(op, lhs, rhs)
+        elif op == OP_JMP_IF_FALSE:
+            condition = pop()
+            if condition is False or condition is None:
+                ip = arg
+        elif op == OP_JMP:
+            ip = arg
+        elif op == OP_CALL:
+            fn = stack[-1 - arg]
+            if type(fn) is monkey_obj.Closure:
+                compiled = fn.fn
+                if arg != compiled.num_params:
+                    raise VMError(
+                        f"wrong number of arguments: want={compiled.num_params}, got={arg}"
+                    )
+                frames.append((code, ip, bp, closure))
+                closure = fn
+                code = compiled.instructions
+                ip = 0
+                bp = len(stack) - arg
+                for _ in range(compiled.num_locals - arg):
+                    push(None)
+            elif type(fn) is monkey_obj.Builtin:
+                args = [box(a) for a in stack[len(stack) - arg :]]
+                del stack[len(stack) - arg - 1 :]
+                push(unbox(fn.fn(args)))
+            else:
+                raise VMError(f"not a function: {type_name(fn)}")
+        elif op == OP_RETURN:
+            value = pop()
+            if not frames:
+                return value
+            del stack[bp - 1 :]
+            code, ip, bp, closure = frames.pop()
+            push(value)
+        elif op == OP_GET_GLOBAL:
+            value = env.get(arg, _MISSING)
+            if value is _MISSING:
+                raise VMError(f"identifier not found: {arg}")
+            push(value)
+        elif op == OP_GET_BUILTIN:
+            # A global defined after this code was compiled still shadows the
+            # builtin, names are looked up when used like in the evaluator
+            push(env.get(builtin_names[arg], builtin_fns[arg]))
+        elif op == OP_GET_FREE:
+            # Only emitted in function bodies, which always run in a closure
+            assert closure is not None
+            push(closure.free[arg])
+        elif op == OP_POP:
+            pop()
+        elif op == OP_SET_LOCAL:
+            stack[bp + arg] = pop()
+        elif op == OP_SET_GLOBAL:
+            env[arg] = pop()
+        elif op == OP_MUL:
+            rhs = pop()
+            lhs = stack[-1]
+            if type(lhs) is int and type(rhs) is int:
+                stack[-1] = lhs * rhs
+            else:
+                stack[-1] = binary_op(op, lhs, rhs)
+        elif op == OP_DIV or op == OP_EQ or op == OP_NOT_EQ or op == OP_GT:
+            rhs = pop()
+            stack[-1] = binary_op(op, stack[-1], rhs)
+        elif op == OP_MINUS:
+            value = stack[-1]
+            if type(value) is not int:
+                raise VMError(f"unknown operator: -{type_name(value)}")
+            stack[-1] = -value
+        elif op == OP_BANG:
+            value = stack[-1]
+            stack[-1] = value is False or value is None
+        elif op == OP_INDEX:
+            index = pop()
+            stack[-1] = index_op(stack[-1], index)
+        elif op == OP_ARRAY:
+            if arg:
+                elements = stack[-arg:]
+                del stack[-arg:]
+            else:
+                elements = []
+            push(monkey_obj.Array(elements=[box(e) for e in elements]))
+        elif op == OP_HASH:
+            if arg:
+                items = stack[-2 * arg :]
+                del stack[-2 * arg :]
+            else:
+                items = []
+            push(build_hash(items))
+        elif op == OP_CLOSURE:
+            compiled, num_free = arg
+            if num_free:
+                free = stack[-num_free:]
+                del stack[-num_free:]
+            else:
+                free = []
+            push(monkey_obj.Closure(fn=compiled, free=free))
+        elif op == OP_CURRENT_CLOSURE:
+            push(closure)
+        else:
+            raise VMError(f"unknown opcode: {op}")
+
+
+def run(code: List[Instruction], env: Dict[str, Any]) -> monkey_obj.Object:
+    try:
+        return box(execute(code, env))
+    except VMError as e:
+        return monkey_obj.Error(e.msg)
+
+
+_operators = {
+    OP_ADD: "+",
+    OP_SUB: "-",
+    OP_MUL: "*",
+    OP_DIV: "/",
+    OP_EQ: "==",
+    OP_NOT_EQ: "!=",
+    OP_LT: "<",
+    OP_GT: ">",
+}
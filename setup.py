@@ -1,11 +1,33 @@
+import os
+
 from setuptools import setup
 
+# MONKEY_CYTHON=1 compiles the interpreter's hot modules to C extensions with
+# Cython, the modules are plain Python so they still work uncompiled
+ext_modules = []
+if os.environ.get("MONKEY_CYTHON") == "1":
+    from Cython.Build import cythonize
+
+    ext_modules = cythonize(
+        [
+            "monkey/eval.py",
+            "monkey/lexer.py",
+            "monkey/object.py",
+            "monkey/parser.py",
+        ],
+        compiler_directives={"language_level": "3"},
+    )
+
 setup(
     name="monkey",
     version="0.1.0",
     author="Jack evans",
     author_email="jack@evans.gb.net",
     description="Python implementation of the Monkey programming language",
+    python_requires=">=3.10",
+    # Listed explicitly, passing ext_modules turns off package discovery
+    packages=["monkey"],
+    ext_modules=ext_modules,
     entry_points={
         "console_scripts": ["monkey=monkey.monkey:main"]
     }
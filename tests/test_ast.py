@@ -1,5 +1,7 @@
 import monkey.ast as ast
 import monkey.token as token
+from monkey.lexer import Lexer
+from monkey.parser import Parser
 
 
 def test_string():
@@ -16,3 +18,22 @@ def test_string():
     ]
     program.statements = statements
     assert str(program) == "let myVar = anotherVar"
+
+
+def test_nodes_are_slotted():
+    node_types = [
+        v
+        for v in vars(ast).values()
+        if isinstance(v, type) and issubclass(v, ast.Node) and v is not ast.Node
+    ]
+    assert node_types
+    for node_type in node_types:
+        assert "__dict__" not in dir(node_type), node_type.__name__
+
+
+def test_free_identifiers():
+    program = Parser(
+        Lexer("fn(x) { let y = x + z; if (y) { let w = 1; w } else { v }; w + len(y) }")
+    ).parse_program()
+    fn = program.statements[0].expression
+    assert ast.free_identifiers(fn) == {"z", "v", "w", "len"}
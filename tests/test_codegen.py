@@ -0,0 +1,129 @@
+import pytest
+
+from monkey.lexer import Lexer
+from monkey.parser import Parser
+from monkey.eval import Eval
+from monkey import codegen
+
+import monkey.object as monkey_object
+
+
+def define(source: str, name: str) -> monkey_object.Function:
+    env = {}
+    Eval(Parser(Lexer(source)).parse_program(), env)
+    return env[name]
+
+
+def emitted(fn: monkey_object.Function):
+    native = codegen.compile_function(fn)
+    assert native is not None
+    return native
+
+
+@pytest.mark.parametrize(
+    "source,args,expected",
+    [
+        ("let f = fn(x, y) { x * y + 1 };", (6, 7), 43),
+        ("let f = fn(x) { -x / 2 };", (7,), -4),
+        ("let f = fn(x) { let y = x * 2; return y; };", (4,), 8),
+        ("let f = fn(x) { if (x > 1) { 1 } else { 0 } };", (2,), 1),
+        ("let f = fn(x) { if (!(x == 1)) { return 5; } x };", (1,), 1),
+        (
+            "let f = fn(n) { if (n < 2) { return n; } f(n - 1) + f(n - 2) };",
+            (20,),
+            6765,
+        ),
+        ("let f = fn(x) { if (x > 1) { } else { 1 }; x };", (2,), 2),
+        ("let f = fn(x) { if (x > 1) { 1 } else { }; x };", (0,), 0),
+    ],
+)
+def test_emit_python(source, args, expected):
+    assert emitted(define(source, "f"))(*args) == expected
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "let f = fn(x) { if (x > 1) { 1 } };",
+        "let f = fn(x) { if (x) { 1 } else { 0 } };",
+        "let f = fn(x) { x == 1 };",
+        "let f = fn(x) { let y = x; };",
+        "let f = fn(x) { len(x) };",
+        'let f = fn(x) { "a" };',
+        "let g = fn(x) { x }; let f = fn(x) { g(x) };",
+        "let f = fn(x) { f(x, x) };",
+        "let f = fn() { };",
+        "let f = fn(x) { if (x > 0) { let y = 1; } else { 0 }; x };",
+    ],
+)
+def test_emit_python_unsupported(source):
+    assert codegen.emit_python(define(source, "f")) is None
+
+
+def test_hot_function_is_compiled(monkeypatch):
+    monkeypatch.setattr(codegen, "JIT_ENABLED", True)
+    fib = define(
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };",
+        "fib",
+    )
+    # Memoized calls aren't counted, fib(60) evaluates more than JIT_THRESHOLD
+    # distinct calls before switching to the compiled version
+    evaluated = Eval(Parser(Lexer("fib(60)")).parse_program(), {"fib": fib})
+    assert fib._native is not None
+    assert evaluated.value == 1548008755920
+
+
+@pytest.mark.parametrize(
+    "source,args",
+    [
+        ("let f = fn(x) { x * x };", (2**32,)),
+        ("let f = fn(x) { x + 1 };", (2**63 - 1,)),
+        ("let f = fn(x) { x - 1 };", (-(2**63),)),
+        ("let f = fn(x) { -x };", (-(2**63),)),
+        ("let f = fn(x) { x / -1 };", (-(2**63),)),
+    ],
+)
+def test_compiled_arithmetic_detects_overflow(source, args):
+    with pytest.raises(OverflowError):
+        emitted(define(source, "f"))(*args)
+
+
+def test_overflowing_calls_fall_back_to_the_interpreter(monkeypatch):
+    monkeypatch.setattr(codegen, "JIT_ENABLED", True)
+    monkeypatch.setattr(codegen, "JIT_THRESHOLD", 1)
+    env = {}
+    Eval(Parser(Lexer("let f = fn(x) { x * x }; f(2);")).parse_program(), env)
+    assert env["f"]._native is not None
+    for source, expected in [
+        ("f(3)", 9),
+        ("f(10000000000)", 10**20),
+        ("f(f(100000))", 10**20),
+        ("f(100000000000000000000)", 10**40),
+    ]:
+        evaluated = Eval(Parser(Lexer(source)).parse_program(), env)
+        assert evaluated.value == expected, source
+
+
+def test_failed_compiles_fall_back_to_the_interpreter(monkeypatch):
+    monkeypatch.setattr(codegen, "emit_python", lambda fn: "def f(v_x):\nreturn 1\n")
+    assert codegen.compile_function(define("let f = fn(x) { x };", "f")) is None
+
+
+def test_rebound_recursive_functions_are_not_called_natively(monkeypatch):
+    monkeypatch.setattr(codegen, "JIT_ENABLED", True)
+    monkeypatch.setattr(codegen, "JIT_THRESHOLD", 1)
+    env = {}
+    source = "let f = fn(x, n) { if (n < 1) { x } else { f(x + 1, n - 1) } }; f(1, 1)"
+    Eval(Parser(Lexer(source)).parse_program(), env)
+    assert env["f"]._native is not None
+    source = "let g = f; let f = fn(x, n) { 100 }; g(1, 1)"
+    assert Eval(Parser(Lexer(source)).parse_program(), env).value == 100
+
+
+def test_only_integer_calls_count_towards_compiling(monkeypatch):
+    monkeypatch.setattr(codegen, "JIT_ENABLED", True)
+    monkeypatch.setattr(codegen, "JIT_THRESHOLD", 2)
+    f = define("let f = fn(x) { x };", "f")
+    Eval(Parser(Lexer('f("a"); f("b"); f(1)')).parse_program(), {"f": f})
+    assert f.call_count == 1
+    assert f._native is None
@@ -4,6 +4,7 @@ from typing import NamedTuple, Any
 from monkey.lexer import Lexer
 from monkey.parser import Parser
 from monkey.eval import Eval
+import monkey.eval as monkey_eval
 
 import monkey.object as monkey_object
 
@@ -259,3 +260,139 @@ def test_array_index_expressions(test_input, expected):
         check_integer_object(evaluated, int(expected))
     else:
         assert evaluated == monkey_object.NULL
+
+
+def test_function_results_are_memoized():
+    source = """
+    let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+    fib(40);
+    """
+    check_integer_object(check_eval(source), 102334155)
+
+
+def test_printing_functions_are_not_memoized(capsys):
+    source = "let say = fn(x) { puts(x); x }; say(1); say(1);"
+    check_integer_object(check_eval(source), 1)
+    assert capsys.readouterr().out == "1\n1\n"
+
+
+def test_functions_see_rebound_globals():
+    source = "let y = 1; let f = fn(x) { x + y }; let a = f(1); let y = 10; f(1)"
+    check_integer_object(check_eval(source), 11)
+
+
+def test_functions_calling_printing_functions_are_not_memoized(capsys):
+    source = "let g = fn() { puts(1); 2 }; let f = fn() { g() }; f(); f()"
+    check_integer_object(check_eval(source), 2)
+    assert capsys.readouterr().out == "1\n1\n"
+
+
+def test_rebinding_a_recursive_function_bypasses_its_memo():
+    source = """
+    let f = fn(n) { if (n < 1) { 0 } else { f(n - 1) + 1 } };
+    let g = f;
+    let a = g(3);
+    let f = fn(n) { 100 };
+    g(3);
+    """
+    check_integer_object(check_eval(source), 101)
+
+
+@pytest.mark.parametrize("test_input", ["", "if (true) {}", "fn() {}()"])
+def test_empty_blocks_evaluate_to_null(test_input):
+    assert check_eval(test_input) == monkey_object.NULL
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ("let a = [1, 2, 3]; rest(a)", "[2, 3]"),
+        ("let a = [1, 2, 3]; rest(rest(rest(a)))", "[]"),
+        ("let a = [1, 2, 3]; push(rest(a), 4)", "[2, 3, 4]"),
+        (
+            "let a = [1]; let b = push(a, 2); let c = push(a, 3); [a, b, c]",
+            "[[1], [1, 2], [1, 3]]",
+        ),
+        ("let a = [1, 2]; let b = rest(a); push(a, 3); b", "[2]"),
+        ("let a = push([], 1); [len(a), first(a), last(a), a[0]]", "[1, 1, 1, 1]"),
+        (
+            "let a = rest([1, 2, 3]); [len(a), first(a), last(a), a[1], a[2]]",
+            "[2, 2, 3, 3, null]",
+        ),
+    ],
+)
+def test_array_builtins_share_storage(test_input, expected):
+    assert check_eval(test_input).inspect() == expected
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ('{"one": 1, "two": 2}["two"]', 2),
+        ('let key = "one"; {"one": 10 - 9}[key]', 1),
+        ('{"one": 1}["two"]', None),
+        ("{1: 10, true: 20}[1]", 10),
+        ("{1: 10, true: 20}[true]", 20),
+        ('{"one": 1, "one": 2}["one"]', 2),
+        ('{"one": 1}[fn(x) { x }]', "unusable as hash key: FUNCTION"),
+        ('{"one": 1}[[1]]', "unusable as hash key: ARRAY"),
+    ],
+)
+def test_hash_index_expressions(test_input, expected):
+    evaluated = check_eval(test_input)
+    if isinstance(expected, int):
+        check_integer_object(evaluated, expected)
+    elif isinstance(expected, str):
+        assert isinstance(evaluated, monkey_object.Error)
+        assert evaluated.msg == expected
+    else:
+        assert evaluated == monkey_object.NULL
+
+
+def test_hash_keys_are_distinguished_by_type():
+    assert monkey_object.hash_key(monkey_object.make_int(1)) != monkey_object.hash_key(
+        monkey_object.TRUE
+    )
+
+
+def test_eval_frames_resolve_enclosing_environments():
+    source = """
+    let __parent__ = 1;
+    let outer = fn(x) { fn(y) { fn(z) { __parent__ + x + y + z } } };
+    outer(2)(3)(4);
+    """
+    check_integer_object(check_eval(source), 10)
+
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    # Forces the thread pool path even where there's a GIL, with a fresh pool
+    # so tests can tell whether it was used
+    monkeypatch.setattr(monkey_eval, "_PARALLEL", True)
+    monkeypatch.setattr(monkey_eval, "_executor", None)
+    yield
+    if monkey_eval._executor is not None:
+        monkey_eval._executor.shutdown()
+
+
+def test_eval_parallel_expressions(thread_pool):
+    source = """
+    let a = [1, 2, 3, 4];
+    [len(a), first(rest(a)), 3 * 3, [last(a), len("abcd"), 1, 2][0 + 1]];
+    """
+    assert check_eval(source).inspect() == "[4, 2, 9, 4]"
+    assert monkey_eval._executor is not None
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        "[puts(1), puts(2), puts(3), puts(4)]",
+        "let q = fn(x) { puts(x) }; let r = fn(x) { q(x) }; [r(1), r(2), r(3), r(4)]",
+        "let len = fn(x) { puts(x) }; [len(1), len(2), len(3), len(4)]",
+    ],
+)
+def test_eval_impure_expressions_stay_sequential(thread_pool, capsys, test_input):
+    check_eval(test_input)
+    assert capsys.readouterr().out == "1\n2\n3\n4\n"
+    assert monkey_eval._executor is None
@@ -1,7 +1,7 @@
 from typing import NamedTuple
 
 import monkey.token as token
-from monkey.lexer import Lexer
+from monkey.lexer import Lexer, tokenize
 
 
 def test_next_token():
@@ -130,3 +130,41 @@ def test_next_token():
     for test in tests:
         tok = l.next_token()
         assert tok.tok_type == test.expected_type
+
+
+def test_next_token_edge_cases():
+    l = Lexer('let my_var2 = @; "unterminated')
+
+    expected = [
+        (token.LET, "let"),
+        (token.IDENT, "my_var2"),
+        (token.ASSIGN, "="),
+        (token.ILLEGAL, "@"),
+        (token.SEMICOLON, ";"),
+        (token.ILLEGAL, '"'),
+        (token.IDENT, "unterminated"),
+        (token.EOF, ""),
+        (token.EOF, ""),
+    ]
+
+    for expected_type, expected_literal in expected:
+        tok = l.next_token()
+        assert tok.tok_type == expected_type
+        assert tok.literal == expected_literal
+
+
+def test_tokenize():
+    assert tokenize("let x = 5;") == [
+        token.Token(token.LET, "let"),
+        token.Token(token.IDENT, "x"),
+        token.Token(token.ASSIGN, "="),
+        token.Token(token.INT, "5"),
+        token.Token(token.SEMICOLON, ";"),
+        token.Token(token.EOF, ""),
+    ]
+
+
+def test_tokenize_shares_fixed_tokens():
+    first_let, _, first_semi, second_let, _, second_semi, _ = tokenize("let a; let b;")
+    assert first_let is second_let
+    assert first_semi is second_semi
@@ -1,13 +1,34 @@
-from typing import NamedTuple, cast, List, Any
+from functools import partial
+from typing import Callable, Dict, NamedTuple, cast, List, Any
 
 import pytest
 
 from monkey.lexer import Lexer
-from monkey.parser import Parser
-from monkey.token import Token
+from monkey.parser import NoPrefixParseMethodException, Parser
+import monkey.token as token
 import monkey.ast as ast
 
 
+# Tests only read the AST, so every test parsing the same source shares the
+# program parsed the first time
+@pytest.fixture(scope="session")
+def parse_cache():
+    return {}
+
+
+_PARSER = Parser(Lexer(""))
+
+
+def parse(source, cache):
+    program = cache.get(source)
+    if program is None:
+        _PARSER.reset(Lexer(source))
+        program = _PARSER.parse_program()
+        assert _PARSER.errors == []
+        cache[source] = program
+    return program
+
+
 def check_let_statement(stmt, name: str):
     assert stmt.token_literal() == "let"
 
@@ -18,70 +39,56 @@ def check_let_statement(stmt, name: str):
     assert stmt.name.token_literal() == name
 
 
-@pytest.mark.parametrize(
-    "source,expected_identifier,expected_value",
-    [
-        ("let x = 5;", "x", 5),
-        ("let y = true;", "y", True),
-        ("let foobar = y;", "foobar", "y"),
-    ],
+_LET_CASES = (
+    ("let x = 5;", "x", 5),
+    ("let y = true;", "y", True),
+    ("let foobar = y;", "foobar", "y"),
 )
-def test_let_statements(source, expected_identifier, expected_value):
-    l = Lexer(source)
-    p = Parser(l)
 
-    program = p.parse_program()
-    assert p.errors == []
 
-    assert program is not None
+# Cases too small to be worth a test each are checked in a loop, the source is
+# included in assertion messages to tell which one failed
+def test_let_statements(parse_cache):
+    for source, expected_identifier, expected_value in _LET_CASES:
+        program = parse(source, parse_cache)
 
-    assert len(program.statements) == 1
+        assert len(program.statements) == 1, source
 
-    stmt = program.statements[0]
+        stmt = program.statements[0]
 
-    check_let_statement(stmt, expected_identifier)
+        check_let_statement(stmt, expected_identifier)
 
-    assert stmt.value.value == expected_value
+        assert stmt.value.value == expected_value, source
 
 
-def test_return_statements():
+def test_return_statements(parse_cache):
     source = """
     return 5;
     return 10;
     return 993322;
     """
 
-    l = Lexer(source)
-    p = Parser(l)
-
-    program = p.parse_program()
-    assert p.errors == []
-
-    assert program is not None
+    program = parse(source, parse_cache)
 
     assert len(program.statements) == 3
 
     for stmt in program.statements:
-        assert type(stmt) == ast.ReturnStatement
+        assert isinstance(stmt, ast.ReturnStatement)
         assert stmt.token_literal() == "return"
 
 
-def test_identifier_expression():
+def test_identifier_expression(parse_cache):
     source = "foobar;"
 
-    l = Lexer(source)
-    p = Parser(l)
-
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
 
     assert len(program.statements) == 1
 
     stmt = program.statements[0]
 
-    assert type(stmt) == ast.ExpressionStatement
+    assert isinstance(stmt, ast.ExpressionStatement)
 
-    assert type(stmt.expression) == ast.Identifier
+    assert isinstance(stmt.expression, ast.Identifier)
 
     ident = stmt.expression
 
@@ -89,22 +96,18 @@ def test_identifier_expression():
     assert ident.token_literal() == "foobar"
 
 
-def test_integer_literals():
+def test_integer_literals(parse_cache):
     source = "5;"
 
-    l = Lexer(source)
-    p = Parser(l)
-
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
 
     assert len(program.statements) == 1
 
     stmt = program.statements[0]
 
-    assert type(stmt) == ast.ExpressionStatement
+    assert isinstance(stmt, ast.ExpressionStatement)
 
-    assert type(stmt.expression) == ast.IntegerLiteral
+    assert isinstance(stmt.expression, ast.IntegerLiteral)
 
     literal = stmt.expression
 
@@ -112,124 +115,129 @@ def test_integer_literals():
     assert literal.token_literal() == "5"
 
 
-@pytest.mark.parametrize(
-    "source,operator,expected",
-    [
-        ("!5;", "!", 5),
-        ("-15;", "-", 15),
-    ],
+_PREFIX_CASES = (
+    ("!5;", "!", 5),
+    ("-15;", "-", 15),
 )
-def test_prefix_expressions(source, operator, expected):
-    l = Lexer(source)
-    p = Parser(l)
 
-    program = p.parse_program()
-    assert p.errors == []
 
-    assert len(program.statements) == 1
+def test_prefix_expressions(parse_cache):
+    for source, operator, expected in _PREFIX_CASES:
+        program = parse(source, parse_cache)
 
-    stmt = program.statements[0]
+        assert len(program.statements) == 1, source
 
-    assert type(stmt) == ast.ExpressionStatement
+        stmt = program.statements[0]
 
-    assert type(stmt.expression) == ast.PrefixExpression
+        assert isinstance(stmt, ast.ExpressionStatement), source
 
-    assert stmt.expression.operator == operator
+        assert isinstance(stmt.expression, ast.PrefixExpression), source
 
-    assert stmt.expression.right.value == expected
-
-
-@pytest.mark.parametrize(
-    "source,left,operator,right",
-    [
-        ("5 + 5", 5, "+", 5),
-        ("5 - 5", 5, "-", 5),
-        ("5 * 5", 5, "*", 5),
-        ("5 / 5", 5, "/", 5),
-        ("5 > 5", 5, ">", 5),
-        ("5 < 5", 5, "<", 5),
-        ("5 == 5", 5, "==", 5),
-        ("5 != 5", 5, "!=", 5),
-    ],
-)
-def test_infix_expressions(source, left, operator, right):
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
+        assert stmt.expression.operator == operator, source
 
-    assert len(program.statements) == 1
+        assert stmt.expression.right.value == expected, source
 
-    stmt = program.statements[0]
 
-    assert type(stmt) == ast.ExpressionStatement
+_INFIX_CASES = (
+    ("5 + 5", 5, "+", 5),
+    ("5 - 5", 5, "-", 5),
+    ("5 * 5", 5, "*", 5),
+    ("5 / 5", 5, "/", 5),
+    ("5 > 5", 5, ">", 5),
+    ("5 < 5", 5, "<", 5),
+    ("5 == 5", 5, "==", 5),
+    ("5 != 5", 5, "!=", 5),
+)
 
-    assert type(stmt.expression) == ast.InfixExpression
 
-    assert stmt.expression.left.value == left
+# The operands are the same in every case, so the cases are parsed from tokens
+# lexed once here rather than lexing each source
+_FIVE = Lexer("5").next_token()
+_OPERATOR_TOKENS = {
+    operator: Lexer(operator).next_token() for _, _, operator, _ in _INFIX_CASES
+}
+
+
+def test_infix_expressions(parse_cache):
+    for source, left, operator, right in _INFIX_CASES:
+        program = parse_cache.get(source)
+        if program is None:
+            p = Parser.from_tokens([_FIVE, _OPERATOR_TOKENS[operator], _FIVE])
+            program = parse_cache[source] = p.parse_program()
+            assert p.errors == [], source
+        assert str(program) == f"({source})"
+
+        assert len(program.statements) == 1, source
+
+        stmt = program.statements[0]
+
+        assert isinstance(stmt, ast.ExpressionStatement), source
+
+        assert isinstance(stmt.expression, ast.InfixExpression), source
+
+        assert stmt.expression.left.value == left, source
+
+        assert stmt.expression.operator == operator, source
+
+        assert stmt.expression.right.value == right, source
+
+
+_PRECEDENCE_CASES = (
+    ("-a * b", "((-a) * b)"),
+    ("!-a", "(!(-a))"),
+    ("a + b + c", "((a + b) + c)"),
+    ("a + b - c", "((a + b) - c)"),
+    ("a * b * c", "((a * b) * c)"),
+    ("a * b / c", "((a * b) / c)"),
+    ("a + b / c", "(a + (b / c))"),
+    ("a + b * c + d / e - f", "(((a + (b * c)) + (d / e)) - f)"),
+    ("3 + 4; -5 * 5", "(3 + 4)((-5) * 5)"),
+    ("5 > 4 == 3 < 4", "((5 > 4) == (3 < 4))"),
+    ("5 < 4 != 3 > 4", "((5 < 4) != (3 > 4))"),
+    ("true", "true"),
+    ("false", "false"),
+    ("3 > 5 == true", "((3 > 5) == true)"),
+    ("3 < 5 == true", "((3 < 5) == true)"),
+    ("1 + (2 + 3) + 4", "((1 + (2 + 3)) + 4)"),
+    ("(5 + 5) * 2", "((5 + 5) * 2)"),
+    ("a + add(b * c) + d", "((a + add((b * c))) + d)"),
+    (
+        "add(a, b, 1, 2 * 3, 4 + 5, add(6, 7 * 8))",
+        "add(a, b, 1, (2 * 3), (4 + 5), add(6, (7 * 8)))",
+    ),
+    ("add(a + b + c * d / f + g)", "add((((a + b) + ((c * d) / f)) + g))"),
+    ("a * [1, 2, 3, 4][b * c] * d", "((a * ([1, 2, 3, 4][(b * c)])) * d)"),
+    (
+        "add(a * b[2], b[1], 2 * [1, 2][1])",
+        "add((a * (b[2])), (b[1]), (2 * ([1, 2][1])))",
+    ),
+)
 
-    assert stmt.expression.operator == operator
 
-    assert stmt.expression.right.value == right
+# Every source is parsed and printed once up front, each case just compares
+# strings
+@pytest.fixture(scope="module")
+def precedence_results(parse_cache):
+    return {source: str(parse(source, parse_cache)) for source, _ in _PRECEDENCE_CASES}
 
 
-@pytest.mark.parametrize(
-    "source,expected",
-    [
-        ("-a * b", "((-a) * b)"),
-        ("!-a", "(!(-a))"),
-        ("a + b + c", "((a + b) + c)"),
-        ("a + b - c", "((a + b) - c)"),
-        ("a * b * c", "((a * b) * c)"),
-        ("a * b / c", "((a * b) / c)"),
-        ("a + b / c", "(a + (b / c))"),
-        ("a + b * c + d / e - f", "(((a + (b * c)) + (d / e)) - f)"),
-        ("3 + 4; -5 * 5", "(3 + 4)((-5) * 5)"),
-        ("5 > 4 == 3 < 4", "((5 > 4) == (3 < 4))"),
-        ("5 < 4 != 3 > 4", "((5 < 4) != (3 > 4))"),
-        ("true", "true"),
-        ("false", "false"),
-        ("3 > 5 == true", "((3 > 5) == true)"),
-        ("3 < 5 == true", "((3 < 5) == true)"),
-        ("1 + (2 + 3) + 4", "((1 + (2 + 3)) + 4)"),
-        ("(5 + 5) * 2", "((5 + 5) * 2)"),
-        ("a + add(b * c) + d", "((a + add((b * c))) + d)"),
-        (
-            "add(a, b, 1, 2 * 3, 4 + 5, add(6, 7 * 8))",
-            "add(a, b, 1, (2 * 3), (4 + 5), add(6, (7 * 8)))",
-        ),
-        ("add(a + b + c * d / f + g)", "add((((a + b) + ((c * d) / f)) + g))"),
-        ("a * [1, 2, 3, 4][b * c] * d", "((a * ([1, 2, 3, 4][(b * c)])) * d)"),
-        (
-            "add(a * b[2], b[1], 2 * [1, 2][1])",
-            "add((a * (b[2])), (b[1]), (2 * ([1, 2][1])))",
-        ),
-    ],
-)
-def test_operator_precedence_parsing(source, expected):
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
-    assert str(program) == expected
+@pytest.mark.parametrize("source,expected", _PRECEDENCE_CASES)
+def test_operator_precedence_parsing(source, expected, precedence_results):
+    assert precedence_results[source] == expected
 
 
-def test_boolean_expression():
+def test_boolean_expression(parse_cache):
     source = "true;"
 
-    l = Lexer(source)
-    p = Parser(l)
-
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
 
     assert len(program.statements) == 1
 
     stmt = program.statements[0]
 
-    assert type(stmt) == ast.ExpressionStatement
+    assert isinstance(stmt, ast.ExpressionStatement)
 
-    assert type(stmt.expression) == ast.Boolean
+    assert isinstance(stmt.expression, ast.Boolean)
 
     ident = stmt.expression
 
@@ -237,22 +245,18 @@ def test_boolean_expression():
     assert ident.token_literal() == "true"
 
 
-def test_if_expression():
+def test_if_expression(parse_cache):
     source = "if (x < y) { x }"
 
-    l = Lexer(source)
-    p = Parser(l)
-
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
 
     assert len(program.statements) == 1
 
     stmt = program.statements[0]
 
-    assert type(stmt) == ast.ExpressionStatement
+    assert isinstance(stmt, ast.ExpressionStatement)
 
-    assert type(stmt.expression) == ast.IfExpression
+    assert isinstance(stmt.expression, ast.IfExpression)
 
     assert stmt.expression.condition.left.value == "x"
 
@@ -265,59 +269,48 @@ def test_if_expression():
     assert len(stmt.expression.consequence.statements) == 1
 
 
-def test_function_literal_parsing():
+def test_function_literal_parsing(parse_cache):
 
     source = "fn(x, y) { x + y; }"
 
-    l = Lexer(source)
-    p = Parser(l)
-
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
 
     assert len(program.statements) == 1
 
     stmt = program.statements[0]
 
-    assert type(stmt) == ast.ExpressionStatement
+    assert isinstance(stmt, ast.ExpressionStatement)
 
-    assert type(stmt.expression) == ast.FunctionLiteral
+    assert isinstance(stmt.expression, ast.FunctionLiteral)
 
-    assert [str(s) for s in stmt.expression.params] == ["x", "y"]
+    assert [p.value for p in stmt.expression.params] == ["x", "y"]
 
     # TODO finish me off please
 
 
-@pytest.mark.parametrize(
-    "source,expected",
-    [
-        ("fn() {};", []),
-        ("fn(x) {};", ["x"]),
-        ("fn(x, y, z) {};", ["x", "y", "z"]),
-    ],
+_FUNC_PARAM_CASES = (
+    ("fn() {};", []),
+    ("fn(x) {};", ["x"]),
+    ("fn(x, y, z) {};", ["x", "y", "z"]),
 )
-def test_function_parameter_parsing(source, expected):
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
+
+
+@pytest.mark.parametrize("source,expected", _FUNC_PARAM_CASES)
+def test_function_parameter_parsing(source, expected, parse_cache):
+    program = parse(source, parse_cache)
     stmt = program.statements[0]
-    assert type(stmt) == ast.ExpressionStatement
-    assert type(stmt.expression) == ast.FunctionLiteral
+    assert isinstance(stmt, ast.ExpressionStatement)
+    assert isinstance(stmt.expression, ast.FunctionLiteral)
 
     func: ast.FunctionLiteral = stmt.expression
 
-    assert len(func.params) == len(expected)
+    assert [p.value for p in func.params] == expected
 
 
-def test_call_expression_parsing():
+def test_call_expression_parsing(parse_cache):
     source = "add(1, 2 * 3, 4 + 5);"
 
-    l = Lexer(source)
-    p = Parser(l)
-
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
 
     assert len(program.statements) == 1
 
@@ -331,57 +324,26 @@ def test_call_expression_parsing():
 
     assert len(stmt.expression.arguments) == 3
 
-    assert stmt.expression == ast.CallExpression(
-        token=Token(tok_type="(", literal="("),
-        function=ast.Identifier(
-            token=Token(tok_type="IDENT", literal="add"), value="add"
-        ),
-        arguments=[
-            ast.IntegerLiteral(token=Token(tok_type="INT", literal="1"), value=1),
-            ast.InfixExpression(
-                token=Token(tok_type="*", literal="*"),
-                left=ast.IntegerLiteral(
-                    token=Token(tok_type="INT", literal="2"), value=2
-                ),
-                operator="*",
-                right=ast.IntegerLiteral(
-                    token=Token(tok_type="INT", literal="3"), value=3
-                ),
-            ),
-            ast.InfixExpression(
-                token=Token(tok_type="+", literal="+"),
-                left=ast.IntegerLiteral(
-                    token=Token(tok_type="INT", literal="4"), value=4
-                ),
-                operator="+",
-                right=ast.IntegerLiteral(
-                    token=Token(tok_type="INT", literal="5"), value=5
-                ),
-            ),
-        ],
-    )
+    arguments = stmt.expression.arguments
+    check_literal_expression(arguments[0], 1)
+    check_infix_expression(arguments[1], 2, "*", 3)
+    check_infix_expression(arguments[2], 4, "+", 5)
 
     assert str(stmt.expression) == "add(1, (2 * 3), (4 + 5))"
 
 
-def test_string_literal_expression():
+def test_string_literal_expression(parse_cache):
     source = '"hello world";'
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
     stmt = program.statements[0]
     assert isinstance(stmt, ast.ExpressionStatement)
     assert isinstance(stmt.expression, ast.StringLiteral)
     assert stmt.expression.value == "hello world"
 
 
-def test_parsing_array_literal():
+def test_parsing_array_literal(parse_cache):
     source = "[1, 2 * 2, 3 + 3];"
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
     stmt = program.statements[0]
     assert isinstance(stmt, ast.ExpressionStatement)
     array = stmt.expression
@@ -392,12 +354,9 @@ def test_parsing_array_literal():
     assert literal.token_literal() == "1"
 
 
-def test_parsing_index_expressions():
+def test_parsing_index_expressions(parse_cache):
     source = "myArray[1 + 1]"
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
     stmt = program.statements[0]
     assert isinstance(stmt, ast.ExpressionStatement)
     expression = stmt.expression
@@ -406,7 +365,7 @@ def test_parsing_index_expressions():
     assert isinstance(left, ast.Identifier)
     assert left.value == "myArray"
     assert left.token_literal() == "myArray"
-    check_infix_expression(expression.index, 1, "+", "1")
+    check_infix_expression(expression.index, 1, "+", 1)
 
 
 def check_infix_expression(exp: ast.Node, left: Any, operator: str, right: Any):
@@ -417,12 +376,9 @@ def check_infix_expression(exp: ast.Node, left: Any, operator: str, right: Any):
 
 
 def check_literal_expression(exp: ast.Node, expected: Any):
-    if isinstance(exp, int):
-        check_integer_literal(exp, expected)
-    elif isinstance(exp, str):
-        check_identifier(exp, expected)
-    else:
-        assert "Type not known"
+    handler = _LITERAL_HANDLERS.get(type(expected))
+    assert handler is not None, "Type not known"
+    handler(exp, expected)
 
 
 def check_identifier(exp: ast.Node, value: str):
@@ -437,12 +393,16 @@ def check_integer_literal(il: ast.Node, val: int):
     assert il.token_literal() == str(val)
 
 
-def test_parsing_hash_literal():
+# How an expected value is checked against a node depends on its type
+_LITERAL_HANDLERS: Dict[type, Callable[[ast.Node, Any], None]] = {
+    int: check_integer_literal,
+    str: check_identifier,
+}
+
+
+def test_parsing_hash_literal(parse_cache):
     source = '{"one": 1, "two": 2, "three": 3}'
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
     stmt = program.statements[0]
     assert isinstance(stmt, ast.ExpressionStatement)
     hash_literal = stmt.expression
@@ -452,18 +412,15 @@ def test_parsing_hash_literal():
 
     expected = {"one": 1, "two": 2, "three": 3}
 
-    for key, value in hash_literal.pairs.items():
+    for key, value in hash_literal.pairs:
         assert isinstance(key, ast.StringLiteral)
         check_integer_literal(value, expected[str(key)])
 
 
-def test_parsing_empty_hash_literal():
+def test_parsing_empty_hash_literal(parse_cache):
     source = "{}"
 
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
     stmt = program.statements[0]
     assert isinstance(stmt, ast.ExpressionStatement)
     hash_literal = stmt.expression
@@ -471,12 +428,9 @@ def test_parsing_empty_hash_literal():
     assert len(hash_literal.pairs) == 0
 
 
-def test_parsing_hash_literal_with_expressions():
+def test_parsing_hash_literal_with_expressions(parse_cache):
     source = '{"one": 0 + 1, "two": 10 - 8, "three": 15 / 5}'
-    l = Lexer(source)
-    p = Parser(l)
-    program = p.parse_program()
-    assert p.errors == []
+    program = parse(source, parse_cache)
     stmt = program.statements[0]
     assert isinstance(stmt, ast.ExpressionStatement)
     hash_literal = stmt.expression
@@ -485,12 +439,95 @@ def test_parsing_hash_literal_with_expressions():
     assert len(hash_literal.pairs) == 3
 
     tests = {
-        "one": lambda e: check_infix_expression(e, 0, "+", 1),
-        "two": lambda e: check_infix_expression(e, 10, "-", 8),
-        "three": lambda e: check_infix_expression(e, 15, "/", 5),
+        "one": partial(check_infix_expression, left=0, operator="+", right=1),
+        "two": partial(check_infix_expression, left=10, operator="-", right=8),
+        "three": partial(check_infix_expression, left=15, operator="/", right=5),
     }
 
-    for key, value in hash_literal.pairs.items():
+    for key, value in hash_literal.pairs:
         assert isinstance(key, ast.StringLiteral)
-        test_fn = tests[str(key)]
-        test_fn(value)
+        tests[str(key)](value)
+
+
+def test_memoized_parsing():
+    source = "add(a * b[2], b[1], 2 * [1, 2][1]); let x = -a + b;"
+    p = Parser(Lexer(source), memoize=True)
+    program = p.parse_program()
+    assert p.errors == []
+    assert str(program) == str(Parser(Lexer(source)).parse_program())
+
+    # Re-parsing from the start reuses every memoized expression
+    memoized = len(p._memo)
+    p.seek(0)
+    assert str(p.parse_program()) == str(program)
+    assert len(p._memo) == memoized
+
+
+def test_literal_nodes_are_shared():
+    program = Parser(Lexer("1 + 1; true == true; 2")).parse_program()
+    ints, bools, two = [s.expression for s in program.statements]
+    assert ints.left is ints.right
+    assert bools.left is bools.right
+    assert two.value == 2
+
+
+def test_constant_expressions_are_shared():
+    source = '"a" + "b"; 1 + 2 * 3; "a" + "b"; 1 + 2 * 3; x + 1; x + 1'
+    program = Parser(Lexer(source)).parse_program()
+    strs, ints, strs2, ints2, x, x2 = [s.expression for s in program.statements]
+    assert strs is strs2
+    assert ints.right is ints2.right
+    assert x.right is x2.right
+    assert x is not x2
+
+
+def test_expressions_are_not_shared_after_errors():
+    p = Parser(Lexer("let 5; 1 + 2; 1 + 2"))
+    program = p.parse_program()
+    assert p.errors != []
+    first, second = [s.expression for s in program.statements[-2:]]
+    assert str(first) == str(second) == "(1 + 2)"
+    assert first is not second
+
+
+def test_parser_errors():
+    p = Parser(Lexer("let x 5; let 5;"))
+    p.parse_program()
+    assert p.errors == [(token.ASSIGN, token.INT), (token.IDENT, token.INT)]
+    assert p.errors_formatted == [
+        'expected next token to be "=" got "INT" instead',
+        'expected next token to be "IDENT" got "INT" instead',
+    ]
+
+
+def test_parser_reset():
+    p = Parser(Lexer("add(a * b[2], b[1]); let x 5;"), memoize=True)
+    p.parse_program()
+    assert p.errors != [] and p._memo != {}
+
+    p.reset(Lexer("let y = 10;"))
+    assert p.errors == [] and p._memo == {}
+    assert str(p.parse_program()) == "let y = 10"
+
+
+@pytest.mark.parametrize(
+    "tokens,expected",
+    [
+        ([], ""),
+        ([token.Token(token.INT, "5")], "5"),
+        ([token.Token(token.INT, "5"), token.Token(token.EOF, "")], "5"),
+    ],
+)
+def test_parsing_token_lists_without_eof(tokens, expected):
+    assert str(Parser(tokens).parse_program()) == expected
+    assert str(Parser.from_tokens(tokens).parse_program()) == expected
+    p = Parser(Lexer("1 + 2"))
+    p.parse_program()
+    p.reset(tokens)
+    assert str(p.parse_program()) == expected
+
+
+def test_no_prefix_parse_function():
+    with pytest.raises(NoPrefixParseMethodException) as exc_info:
+        Parser(Lexer(")")).parse_program()
+    assert str(exc_info.value) == 'no prefix parse function for ")" found'
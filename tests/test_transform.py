@@ -0,0 +1,93 @@
+import pytest
+
+from monkey.lexer import Lexer
+from monkey.parser import Parser
+from monkey.eval import Eval
+from monkey.transform import fold_constants, peephole
+import monkey.ast as ast
+
+
+def parse(source: str) -> ast.Program:
+    p = Parser(Lexer(source))
+    program = p.parse_program()
+    assert p.errors == []
+    return program
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [
+        ("1 + 2 * 3", "7"),
+        ("-5", "-5"),
+        ("(5 + 10 * 2 + 15 / 3) * 2 + -10", "50"),
+        ("1 < 2", "true"),
+        ("2 == 3", "false"),
+        ('"foo" + "bar"', "foobar"),
+        ("x + 2 * 3", "(x + 6)"),
+        ("1 / 0", "(1 / 0)"),
+        ("fn(x) { x * (2 + 2) }", "fn(x)(x * 4)"),
+        ("add(1 + 1, [2 * 2][0])", "add(2, ([4][0]))"),
+    ],
+)
+def test_fold_constants(source, expected):
+    assert str(fold_constants(parse(source))) == expected
+
+
+def test_fold_constants_produces_literals():
+    program = fold_constants(parse("3 * 4; 1 > 2"))
+    integer, boolean = [s.expression for s in program.statements]
+    assert isinstance(integer, ast.IntegerLiteral)
+    assert integer.value == 12
+    assert isinstance(boolean, ast.Boolean)
+    assert boolean.value is False
+
+
+def test_fold_constants_clears_cached_strings():
+    program = parse("x + 2 * 3")
+    assert str(program) == "(x + (2 * 3))"
+    assert str(fold_constants(program)) == "(x + 6)"
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [
+        ("fn(x) { let y = x * 2; return y; }", "fn(x)return (x * 2);"),
+        ("fn(x) { if (x) { let y = 1; return y; } }", "fn(x)if\nx return 1;"),
+        ("let y = 1; return y;", "let y = 1return y;"),
+        (
+            "fn(x) { let f = fn() { f }; return f; }",
+            "fn(x)let f = fn()f\nreturn f;",
+        ),
+        (
+            "fn() { let g = fn() { y }; let y = [g]; return y; }",
+            "fn()let g = fn()y\nlet y = [g]\nreturn y;",
+        ),
+    ],
+)
+def test_peephole_let_return(source, expected):
+    assert str(peephole(parse(source))) == expected
+
+
+def test_peephole_add_constant():
+    program = peephole(parse("n - 1; n + 2; 2 + n"))
+    sub, add, other = [s.expression for s in program.statements]
+    assert isinstance(sub, ast.AddK) and sub.constant == -1
+    assert isinstance(add, ast.AddK) and add.constant == 2
+    assert isinstance(other, ast.InfixExpression)
+    assert str(program) == "(n - 1)(n + 2)(2 + n)"
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [
+        (
+            "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)",
+            "610",
+        ),
+        ("let f = fn(x) { let y = x + 1; return y; }; f(1)", "2"),
+        ("true - 1", "ERROR: type mismatch: BOOLEAN - INTEGER"),
+        ('"a" + 1', "ERROR: type mismatch: STRING + INTEGER"),
+    ],
+)
+def test_peephole_evaluates_the_same(source, expected):
+    assert Eval(peephole(fold_constants(parse(source))), {}).inspect() == expected
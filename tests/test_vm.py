@@ -0,0 +1,166 @@
+import pytest
+
+from monkey.compiler import compile
+from monkey.lexer import Lexer
+from monkey.parser import Parser
+from monkey import vm
+
+import monkey.object as monkey_object
+
+
+def check_run(source: str, env=None) -> monkey_object.Object:
+    lexer = Lexer(source)
+    parser = Parser(lexer)
+    program = parser.parse_program()
+    env = {} if env is None else env
+    return vm.run(compile(program, env), env)
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ("5", 5),
+        ("-10", -10),
+        ("5 + 5 + 5 + 5 - 10", 10),
+        ("2 * 2 * 2 * 2 * 2", 32),
+        ("50 / 2 * 2 + 10", 60),
+        ("(5 + 10 * 2 + 15 / 3) * 2 + -10", 50),
+        ("let a = 5; let b = a; let c = a + b + 5; c;", 15),
+        ("if (1 > 2) { 10 } else { 20 }", 20),
+        ("if (1) { 10 }", 10),
+        ("9; return 2 * 5; 9;", 10),
+        ("if (10 > 1) { if (10 > 1) { return 10; } return 1; }", 10),
+        ("let add = fn(x, y) { x + y; }; add(5 + 5, add(5, 5));", 20),
+        ("fn(x) { x; }(5)", 5),
+        ("let f = fn(x) { let y = x * 2; return y; }; f(4);", 8),
+        ("let adder = fn(x) { fn(y) { x + y } }; adder(2)(3);", 5),
+        (
+            "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15);",
+            610,
+        ),
+        ('len("hello world")', 11),
+        ("[1, 2, 3][1 + 1];", 3),
+        ("let myArray = [1, 2, 3]; myArray[0] + myArray[1] + myArray[2];", 6),
+        ('{"one": 1, "two": 2}["two"]', 2),
+        ("len(push([1, 2], 3))", 3),
+    ],
+)
+def test_run_integer_result(test_input, expected):
+    evaluated = check_run(test_input)
+    assert isinstance(evaluated, monkey_object.Integer)
+    assert evaluated.value == expected
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ("1 < 2", True),
+        ("1 != 1", False),
+        ("true == false", False),
+        ("(1 > 2) == false", True),
+        ("!5", False),
+        ("!!false", False),
+    ],
+)
+def test_run_boolean_result(test_input, expected):
+    evaluated = check_run(test_input)
+    assert evaluated is (monkey_object.TRUE if expected else monkey_object.FALSE)
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    ["if (false) { 10 }", "[1, 2, 3][3]", "[1, 2, 3][-1]", "let a = 1;", "first([])"],
+)
+def test_run_null_result(test_input):
+    assert check_run(test_input) is monkey_object.NULL
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ("5 + true;", "type mismatch: INTEGER + BOOLEAN"),
+        ("-true", "unknown operator: -BOOLEAN"),
+        ("5; true + false; 5", "unknown operator: BOOLEAN + BOOLEAN"),
+        (
+            "132 if (10 > 1) {if (10 > 1) {return true + false;}return 1;}",
+            "unknown operator: BOOLEAN + BOOLEAN",
+        ),
+        ("foobar", "identifier not found: foobar"),
+        ('"Hello" - "World"', "unknown operator: STRING - STRING"),
+        ("len(1)", "argument to `len` not supported, got INTEGER"),
+        ("fn(x) { x }()", "wrong number of arguments: want=1, got=0"),
+    ],
+)
+def test_run_error_handling(test_input, expected):
+    evaluated = check_run(test_input)
+    assert isinstance(evaluated, monkey_object.Error)
+    assert evaluated.msg == expected
+
+
+def test_run_string_concatenation():
+    evaluated = check_run('"Hello" + " " + "World!"')
+    assert isinstance(evaluated, monkey_object.String)
+    assert evaluated.value == "Hello World!"
+
+
+def test_run_array_literal():
+    evaluated = check_run("[1, 2 * 2, 3 + 3]")
+    assert isinstance(evaluated, monkey_object.Array)
+    assert [e.value for e in evaluated.elements] == [1, 4, 6]
+
+
+def test_run_recursive_inner_closure():
+    source = """
+    let map = fn(arr, f) {
+        let iter = fn(arr, accumulated) {
+            if (len(arr) == 0) {
+                accumulated
+            } else {
+                iter(rest(arr), push(accumulated, f(first(arr))));
+            }
+        };
+        iter(arr, []);
+    };
+    map([1, 2, 3, 4], fn(x) { x * 2 });
+    """
+    assert check_run(source).inspect() == "[2, 4, 6, 8]"
+
+
+def test_run_globals_persist_between_runs():
+    env = {}
+    check_run("let double = fn(x) { x * 2 };", env)
+    evaluated = check_run("double(21)", env)
+    assert isinstance(evaluated, monkey_object.Integer)
+    assert evaluated.value == 42
+
+
+def test_run_globals_shadow_builtins():
+    env = {}
+    check_run("let len = fn(x) { 42 };", env)
+    evaluated = check_run("len([1])", env)
+    assert isinstance(evaluated, monkey_object.Integer)
+    assert evaluated.value == 42
+
+
+def test_run_unusable_hash_key():
+    evaluated = check_run('{"a": 1}[fn(x) { x }]')
+    assert isinstance(evaluated, monkey_object.Error)
+    assert evaluated.msg == "unusable as hash key: FUNCTION"
+
+
+def test_run_builtins_share_array_storage():
+    env = {}
+    evaluated = check_run("let a = [1, 2, 3]; let b = rest(a); push(b, 4)", env)
+    assert evaluated.inspect() == "[2, 3, 4]"
+    assert env["b"].elements is env["a"].elements
+    assert check_run("a[2] + b[0] + len(b)", env).value == 7
+
+
+def test_run_later_globals_shadow_builtins():
+    env = {}
+    check_run("let size = fn(x) { len(x) };", env)
+    assert check_run("size([1, 2])", env).value == 2
+    check_run("let len = fn(x) { 42 };", env)
+    evaluated = check_run("size([1, 2])", env)
+    assert isinstance(evaluated, monkey_object.Integer)
+    assert evaluated.value == 42